@@ -1,10 +1,10 @@
 import streamlit as st
-import tempfile
+import hashlib
+import math
 import re
+from collections import Counter
 
-from validator.vobo import run_vobo
-from llm.intent_classifier import classify_intent
-from llm.advisor import explain_errors, explain_error  # backward compat
+from llm.advisor import build_issue_index, explain_errors, explain_error  # backward compat
 
 st.set_page_config(
     page_title="Agente VoBo – Matriz de Transformación",
@@ -13,14 +13,206 @@ st.set_page_config(
 
 st.title("🤖 Agente de Gobierno – VoBo Matriz de Transformación")
 
+
+# -----------------------------
+# Recursos pesados (carga diferida)
+# -----------------------------
+# Streamlit re-ejecuta este script en cada interacción: pandas/openpyxl/openai solo se
+# importan la primera vez que se necesitan y quedan cacheados para todo el proceso.
+@st.cache_resource(show_spinner=False)
+def _load_iter_vobo():
+    from validator.vobo import iter_vobo
+    return iter_vobo
+
+
+@st.cache_resource(show_spinner=False)
+def _load_classify_intent():
+    from llm.intent_classifier import classify_intent
+    return classify_intent
+
+
+def _metrics_markdown(metrics: dict) -> str:
+    """Desglose de tiempos de una validación (result["metrics"] de run_vobo)."""
+    summary = metrics.get("summary", {})
+    llm = summary.get("llm", {})
+    lines = [f"**Total:** {metrics.get('total_ms', 0):.0f} ms · **Parseo:** {summary.get('parse_ms', 0):.0f} ms", ""]
+
+    if summary.get("validators"):
+        lines.append("| Validador | ms |\n|---|---:|")
+        lines += [f"| `{name}` | {ms:.0f} |" for name, ms in summary["validators"].items()]
+        lines.append("")
+
+    if llm.get("calls"):
+        lines.append(
+            f"**LLM:** {llm['calls']} llamadas ({llm['errors']} fallidas, {llm['retries']} reintentos) · "
+            f"{llm['ms']:.0f} ms acumulados · {llm['items']} elementos · "
+            f"tokens {llm['tokens_in']} entrada / {llm['tokens_out']} salida"
+        )
+        lines.append("")
+
+    # Solo las hojas más lentas: en libros grandes la tabla completa no aporta
+    sheets = summary.get("sheets", [])[:10]
+    if sheets:
+        lines.append("| Hoja | Etapa | ms | Caché |\n|---|---|---:|---|")
+        lines += [f"| {s['sheet']} | {s['stage']} | {s['ms']:.0f} | {s['cache']} |" for s in sheets]
+    return "\n".join(lines)
+
+
+def _render_metrics(metrics: dict | None):
+    if not metrics: return
+    with st.expander("⏱️ Desglose de tiempos"):
+        st.markdown(_metrics_markdown(metrics))
+
+# -----------------------------
+# Validación en vivo
+# -----------------------------
+VALIDATOR_LABELS = {
+    "validate_error_structure": "Códigos de estado (estructura)",
+    "validate_error_definitions": "Códigos de estado",
+    "validate_backend_mapping": "Mapeo de backend",
+    "validate_bian_alignment": "Alineación semántica BIAN",
+}
+# Bloqueantes que se listan mientras se valida; el resto queda en el conteo y en la tabla
+LIVE_BLOCKING_LINES = 20
+SKIPPED_LABELS = {
+    "statuscode_coherence": "coherencia de códigos HTTP (IA)",
+    "bian_semantic": "alineación semántica BIAN (IA)",
+}
+
+
+def _validate_live(data, fast: bool) -> dict:
+    """Ejecuta el VoBo mostrando los hallazgos a medida que terminan cada hoja y cada validador."""
+    seen, blocking, warnings, result = set(), 0, 0, None
+    with st.status("Validando matriz de transformación...", expanded=True) as status:
+        for event in _load_iter_vobo()(data, concurrent=True, metrics=True, fast=fast):
+            kind = event["type"]
+            if kind == "result":
+                result = event["result"]
+                continue
+            if kind == "validator":
+                label = VALIDATOR_LABELS.get(event["validator"], event["validator"])
+                st.write(f"✔️ {label}: {event['issues']} hallazgos")
+                continue
+
+            # "partial" / "sheet": hallazgos nuevos de una hoja
+            for issue in event["issues"]:
+                if issue.key in seen: continue
+                seen.add(issue.key)
+                if issue.blocking:
+                    blocking += 1
+                    if blocking <= LIVE_BLOCKING_LINES:
+                        st.markdown(f"❌ **{issue.get('sheet', '')}** · `{issue.get('attribute', '')}` — "
+                                    f"{issue.get('message', '')}")
+                elif issue.get("level") == "WARN":
+                    warnings += 1
+            status.update(label=f"Validando matriz de transformación... ❌ {blocking} bloqueantes · "
+                                f"⚠️ {warnings} advertencias")
+        status.update(label="Validación terminada", state="complete", expanded=False)
+    return result
+
+
+# -----------------------------
+# Reporte de hallazgos
+# -----------------------------
+REPORT_PAGE_SIZES = [50, 100, 250]
+# Reportes que se conservan por sesión; los mensajes más antiguos quedan sin tabla
+MAX_REPORTS = 5
+
+
+def _report_id(issues: list) -> str:
+    """
+    Hash del contenido completo de los hallazgos (celda incluida): identifica el reporte en
+    session_state y en la caché de tablas, que es compartida por todas las sesiones.
+    """
+    h = hashlib.sha256()
+    for e in issues:
+        h.update(repr(sorted(dict(e).items(), key=lambda kv: kv[0])).encode("utf-8"))
+        h.update(b"\x1e")
+    return h.hexdigest()[:16]
+
+
+def _keep_report(report_id: str, issues: list):
+    reports = st.session_state.reports
+    reports.pop(report_id, None)
+    reports[report_id] = issues
+    while len(reports) > MAX_REPORTS:
+        reports.pop(next(iter(reports)))
+
+
+def _report_summary(result: dict, issues: list) -> str:
+    if result.get("vobo") is True:
+        response = "✅ **La matriz de transformación ha aprobado el VoBo**\n\n"
+    else:
+        response = "❌ **La matriz de transformación NO aprueba el VoBo**\n\n"
+    if result.get("skipped"):
+        skipped = ", ".join(SKIPPED_LABELS.get(s, s) for s in result["skipped"])
+        response += (f"⚠️ **Checks omitidos por el veredicto rápido:** {skipped}. El rechazo ya era seguro, "
+                     "pero sus hallazgos no aparecen en este reporte. Desactiva el veredicto rápido "
+                     "para obtener la lista completa.\n\n")
+    if not issues:
+        return response
+
+    blocking = sum(1 for e in issues if e.blocking)
+    warnings = sum(1 for e in issues if not e.blocking and e.get("level") == "WARN")
+    categories = Counter(e.get("category") or "SIN CATEGORÍA" for e in issues)
+    response += f"- ❌ Errores que bloquean: **{blocking}**\n- ⚠️ Advertencias: **{warnings}**\n"
+    response += "- Por categoría: " + " · ".join(f"`{c}` {n}" for c, n in categories.most_common()) + "\n\n"
+    response += ("El detalle está en la tabla de hallazgos (filtra por hoja, nivel o categoría). "
+                 "Puedes pedirme que **explique un error o advertencia** (por hoja/atributo).")
+    return response
+
+
+# El argumento con "_" no se hashea: la tabla se cachea por report_id, que ya identifica los hallazgos
+@st.cache_data(show_spinner=False, max_entries=32)
+def _report_table(report_id: str, _issues: list):
+    import pandas as pd
+
+    table = pd.DataFrame({
+        "Bloquea": [e.blocking for e in _issues],
+        "Nivel": [e.get("level", "") for e in _issues],
+        "Hoja": [str(e.get("sheet", "")).strip() for e in _issues],
+        "Celda": [e.get("cell", "") for e in _issues],
+        "Atributo": [e.get("attribute", "") for e in _issues],
+        "Categoría": [e.get("category", "") for e in _issues],
+        "Mensaje": [e.get("message", "") for e in _issues],
+    })
+    # Primero los bloqueantes, conservando el orden de los validadores
+    return table.sort_values("Bloquea", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _render_report(report_id: str | None, key: str):
+    issues = st.session_state.reports.get(report_id) if report_id else None
+    if not issues: return
+
+    with st.expander(f"📋 Hallazgos ({len(issues)})"):
+        table = _report_table(report_id, issues)
+        c_sheet, c_level, c_category = st.columns(3)
+        sheets = c_sheet.multiselect("Hoja", sorted(table["Hoja"].unique()), key=f"{key}-sheet")
+        levels = c_level.multiselect("Nivel", sorted(table["Nivel"].unique()), key=f"{key}-level")
+        categories = c_category.multiselect("Categoría", sorted(table["Categoría"].unique()), key=f"{key}-category")
+
+        view = table
+        if sheets: view = view[view["Hoja"].isin(sheets)]
+        if levels: view = view[view["Nivel"].isin(levels)]
+        if categories: view = view[view["Categoría"].isin(categories)]
+
+        c_size, c_page = st.columns(2)
+        size = c_size.selectbox("Por página", REPORT_PAGE_SIZES, key=f"{key}-size")
+        pages = max(1, math.ceil(len(view) / size))
+        page = c_page.number_input("Página", min_value=1, max_value=pages, value=1, key=f"{key}-page")
+        st.caption(f"{len(view)} hallazgos · página {page} de {pages}")
+        st.dataframe(view.iloc[(page - 1) * size:page * size], hide_index=True, use_container_width=True)
+
+
 # -----------------------------
 # Session state
 # -----------------------------
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if "excel_path" not in st.session_state:
-    st.session_state.excel_path = None
+# Bytes del libro subido: se valida desde memoria, sin archivos temporales en disco
+if "excel_data" not in st.session_state:
+    st.session_state.excel_data = None
 
 if "context" not in st.session_state:
     st.session_state.context = {"errors": []}
@@ -34,12 +226,22 @@ if "uploader_key" not in st.session_state:
 if "last_uploaded_name" not in st.session_state:
     st.session_state.last_uploaded_name = None
 
+if "reports" not in st.session_state:
+    st.session_state.reports = {}
+
+with st.sidebar:
+    st.toggle("⚡ Veredicto rápido", value=False, key="fast_verdict",
+              help="Si los checks estructurales ya rechazan la matriz, no espera a los checks con IA: "
+                   "el reporte avisa de los checks omitidos y no incluye sus hallazgos.")
+
 # -----------------------------
 # Render chat history
 # -----------------------------
-for msg in st.session_state.messages:
+for idx, msg in enumerate(st.session_state.messages):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        _render_report(msg.get("report"), f"msg{idx}")
+        _render_metrics(msg.get("metrics"))
 
 # -----------------------------
 # File uploader
@@ -58,9 +260,7 @@ should_load_file = (
 )
 
 if should_load_file:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        tmp.write(uploaded_file.read())
-        st.session_state.excel_path = tmp.name
+    st.session_state.excel_data = uploaded_file.getvalue()
 
     st.session_state.file_loaded = True
     st.session_state.last_uploaded_name = uploaded_file.name
@@ -79,7 +279,7 @@ if should_load_file:
 if st.session_state.file_loaded:
     if st.button("🔄 Cargar otro archivo"):
         st.session_state.file_loaded = False
-        st.session_state.excel_path = None
+        st.session_state.excel_data = None
         st.session_state.context["errors"] = []
         st.session_state.last_uploaded_name = None
         st.session_state.uploader_key += 1
@@ -131,72 +331,31 @@ if user_input:
 
     # 2) si no aplica, usa LLM
     if intent is None:
-        intent = classify_intent(user_input)
+        intent = _load_classify_intent()(user_input)
 
     response = ""
+    metrics = None
+    report_id = None
 
     # -------------------------
     # VALIDATE VOBO
     # -------------------------
     if intent == "VALIDATE_VOBO":
-        if not st.session_state.excel_path:
+        if not st.session_state.excel_data:
             response = "❗ Primero debes cargar un archivo Excel."
         else:
-            with st.spinner("Validando matriz de transformación..."):
-                result = run_vobo(st.session_state.excel_path)
+            result = _validate_live(st.session_state.excel_data, st.session_state.fast_verdict)
+            metrics = result.get("metrics")
 
             issues = result.get("details", [])
             st.session_state.context["errors"] = issues
+            # Índice para "explica ...": se construye una vez por resultado
+            st.session_state.context["error_index"] = build_issue_index(issues)
 
-            # Separa bloqueantes vs warnings
-            blocking = [e for e in issues if e.get("blocks_vobo") is True or e.get("level") == "ERROR"]
-            warnings = [e for e in issues if e.get("level") == "WARN" and e not in blocking]
-
-            if result.get("vobo") is True:
-                response = "✅ **La matriz de transformación ha aprobado el VoBo**\n\n"
-            else:
-                response = "❌ **La matriz de transformación NO aprueba el VoBo**\n\n"
-
-
-            # --- FUNCIÓN AUXILIAR PARA FORMATO ---
-            def format_issue_line(err):
-                sheet_raw = str(err.get("sheet", "¿?")).strip()
-                attr = err.get("attribute", "¿?")
-                cell = err.get("cell", "")  # Dato nuevo (si existe)
-                msg = err.get("message", "")
-
-                # 1. Evitar "Hoja Hoja 4" -> "Hoja 4"
-                if sheet_raw.lower().startswith("hoja"):
-                    sheet_display = f"**{sheet_raw}**"
-                else:
-                    sheet_display = f"Hoja **{sheet_raw}**"
-
-                # 2. Agregar Celda si existe
-                location_str = sheet_display
-                if cell:
-                    location_str += f" (Celda `{cell}`)"
-
-                line = f"- {location_str} | Atributo `{attr}`"
-                if msg:
-                    line += f"  \n  ↳ {msg}"
-                return line
-
-
-            # -------------------------------------
-
-            if blocking:
-                response += "## ❌ Errores que bloquean\n"
-                for err in blocking:
-                    response += format_issue_line(err) + "\n"
-                response += "\n"
-
-            if warnings:
-                response += "## ⚠️ Advertencias\n"
-                for err in warnings:
-                    response += format_issue_line(err) + "\n"
-
-            if issues:
-                response += "\nPuedes pedirme que **explique un error o advertencia** (por hoja/atributo)."
+            # En el chat solo va el resumen: el detalle se pagina en la tabla de hallazgos
+            report_id = _report_id(issues)
+            _keep_report(report_id, issues)
+            response = _report_summary(result, issues)
 
     # -------------------------
     # EXPLAIN ERROR
@@ -206,7 +365,7 @@ if user_input:
         if not issues:
             response = "No hay errores para explicar. Primero escribe **valida**."
         else:
-            response = explain_errors(user_input, issues)
+            response = explain_errors(user_input, issues, st.session_state.context.get("error_index"))
             if not response.strip():
                 response = explain_error(issues[0])
 
@@ -228,6 +387,9 @@ if user_input:
             "- **explica ...**\n"
         )
 
-    st.session_state.messages.append({"role": "assistant", "content": response})
+    st.session_state.messages.append({"role": "assistant", "content": response, "metrics": metrics,
+                                      "report": report_id})
     with st.chat_message("assistant"):
-        st.markdown(response)
\ No newline at end of file
+        st.markdown(response)
+        _render_report(report_id, f"msg{len(st.session_state.messages) - 1}")
+        _render_metrics(metrics)
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+Regresión del cruce contrato / backend (CONTRACT_MISMATCH, CONSISTENCY, UNDEFINED_ATTRIBUTE).
+
+Para cada escenario genera la matriz (bench/matrix_generator.py), que es coherente con su
+contrato por construcción, y comprueba que:
+- el cruce no reporta nada (p.ej. request.x no se cruza con data.x de la respuesta 200 ni con
+  los code/message de los bloques de error);
+- al plantar en "Backend 1" un tipo incompatible, una obligatoriedad rota y un atributo
+  inexistente se reportan exactamente esos tres, en sus celdas.
+
+Sale con código 1 si algo no coincide.
+
+Uso: python bench/crosscheck_regression.py [--scenarios small medium]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ["VOBO_CACHE"] = "0"
+
+import openpyxl  # noqa: E402
+
+from matrix_generator import generate_matrix  # noqa: E402
+from run_benchmarks import SCENARIOS  # noqa: E402
+from validator.backend_mapping import validate_backend_mapping  # noqa: E402
+
+CROSS_CATEGORIES = {"CONTRACT_MISMATCH", "CONSISTENCY", "UNDEFINED_ATTRIBUTE"}
+PLANT_SHEET = "Backend 1"
+
+
+def _cross_issues(path: str) -> set:
+    details = validate_backend_mapping(path)["details"]
+    return {(i["category"], i["sheet"], i["cell"]) for i in details if i["category"] in CROSS_CATEGORIES}
+
+
+def _plant(path: str) -> set:
+    """Planta un error de cada tipo en filas de Input distintas; devuelve los hallazgos esperados."""
+    wb = openpyxl.load_workbook(path)
+    ws = wb[PLANT_SHEET]
+    rows = [r for r in range(1, ws.max_row + 1)
+            if str(ws.cell(r, 1).value or "").startswith("request.") and ws.cell(r, 2).value != "Array"]
+    mismatch = rows[0]
+    mandatory = next(r for r in rows[1:] if ws.cell(r, 5).value == "Yes")
+    undefined = next(r for r in rows[1:] if r != mandatory)
+
+    ws.cell(mismatch, 2).value = "Date" if ws.cell(mismatch, 2).value != "Date" else "Number"
+    ws.cell(mandatory, 5).value = "No"
+    ws.cell(undefined, 1).value = "request.atributoInexistente"
+    wb.save(path)
+    return {
+        ("CONTRACT_MISMATCH", PLANT_SHEET, f"A{mismatch}"),
+        ("CONSISTENCY", PLANT_SHEET, f"A{mandatory}"),
+        ("UNDEFINED_ATTRIBUTE", PLANT_SHEET, f"A{undefined}"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=["small", "medium"])
+    args = parser.parse_args()
+
+    failures = []
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.scenarios:
+            path = generate_matrix(os.path.join(tmp, f"{name}.xlsx"), **SCENARIOS[name])
+            clean = _cross_issues(path)
+            expected = _plant(path)
+            planted = _cross_issues(path)
+            report[name] = {"clean": len(clean), "planted": len(planted), "expected": len(expected)}
+            if clean:
+                failures.append(f"{name}: {len(clean)} hallazgos en la matriz coherente, p.ej. {sorted(clean)[:3]}")
+            if planted != expected:
+                failures.append(f"{name}: faltan {sorted(expected - planted)}, sobran {sorted(planted - expected)[:3]}")
+    print(json.dumps(report, indent=2))
+
+    for f in failures:
+        print(f"❌ {f}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
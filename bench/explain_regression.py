@@ -0,0 +1,53 @@
+"""
+Regresión de la búsqueda de "explica ..." sobre el índice de hallazgos (llm/advisor.py).
+
+Cada consulta debe resolver exactamente los hallazgos esperados: los StatusCode se encuentran
+por su código HTTP, un código exacto gana a los demás y las palabras genéricas de ruta
+("code", "error", "data") no eligen hallazgos por sí solas.
+
+Sale con código 1 si alguna consulta no coincide.
+
+Uso: python bench/explain_regression.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm.advisor import build_issue_index, _pick_relevant_errors  # noqa: E402
+
+ISSUES = [
+    {"sheet": "Backend 1", "attribute": "data.products18[]", "category": "SYNTAX", "cell": "A12"},
+    {"sheet": "Contrato", "attribute": "Error 403.code", "category": "STATUSCODE", "cell": "B40"},
+    {"sheet": "Contrato", "attribute": "StatusCode 405", "category": "STATUSCODE", "cell": "A50"},
+    {"sheet": "Contrato", "attribute": "StatusCode 415", "category": "STATUSCODE", "cell": "A60"},
+    {"sheet": "Contrato", "attribute": "Error 415.code", "category": "STATUSCODE", "cell": "B62"},
+    {"sheet": "Backend 2", "attribute": "data.customerId", "category": "CONTRACT_MISMATCH", "cell": "A7"},
+]
+
+# consulta -> atributos esperados
+CASES = {
+    "explica StatusCode 405": ["StatusCode 405"],
+    "explica el status code 415": ["StatusCode 415"],
+    "explica el error 405": ["StatusCode 405"],
+    "explica el error 403": ["Error 403.code"],
+    "explica data.customerid": ["data.customerId"],
+    "explica data.custmerId": ["data.customerId"],
+}
+
+
+def main():
+    index = build_issue_index(ISSUES)
+    failures = []
+    for query, expected in CASES.items():
+        got = [e["attribute"] for e in _pick_relevant_errors(query, ISSUES, index)]
+        status = "✅" if got == expected else "❌"
+        print(f"{status} {query!r} -> {got}")
+        if got != expected:
+            failures.append(query)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
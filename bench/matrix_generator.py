@@ -0,0 +1,161 @@
+"""
+Generador de matrices de transformación sintéticas para benchmarks.
+
+Produce libros con la disposición que esperan los validadores:
+- Hoja 0 (contrato): atributos del servicio, resumen "HTTP Status Code" y un bloque
+  "Status Code N" por código (200 con su respuesta, errores con code/message/description).
+- Hojas de backend: "Backend - Input" / "Backend - Output" con su tabla de mapeo y el SQL.
+
+Con la misma semilla el libro es idéntico. Incluye algunos errores realistas (sintaxis de
+arrays, atributos ausentes en el SQL) para que los checks recorran todas sus ramas. Las hojas
+de backend son coherentes con el contrato (mismo tipo y obligatoriedad): el cruce contrato /
+backend no debe reportar nada (ver bench/crosscheck_regression.py).
+
+Uso: python bench/matrix_generator.py salida.xlsx --sheets 10 --rows 300 --codes 20 --sql-columns 100
+"""
+import argparse
+import random
+
+import openpyxl
+
+ERROR_CODES = [400, 401, 403, 404, 405, 409, 412, 415, 422, 429, 500, 502, 503, 504]
+TYPES = ["String", "Number", "Date", "Boolean", "Array", "Object"]
+DESCRIPTIONS = [
+    "Identificador único del cliente", "Importe de la operación", "Fecha de alta del contrato",
+    "Ciudad de residencia", "Código de divisa ISO 4217", "Número de cuenta", "Nombre del titular",
+    "Indicador de cuenta activa", "Lista de productos contratados", "Saldo disponible",
+]
+NAMES = ["customerId", "amount", "openingDate", "city", "currency", "accountNumber", "holderName",
+         "isActive", "products", "balance"]
+
+
+def _error_codes(n: int) -> list:
+    codes = list(ERROR_CODES)
+    while len(codes) < n:
+        codes.append(430 + len(codes))  # códigos de negocio adicionales
+    return codes[:n]
+
+
+def _attribute(rnd: random.Random, i: int, prefix: str = "") -> tuple:
+    base = NAMES[i % len(NAMES)]
+    typ = TYPES[i % len(TYPES)]
+    name = f"{prefix}{base}{i}" + ("[]" if typ == "Array" else "")
+    # ~5% con la sintaxis de array mal puesta
+    if rnd.random() < 0.05:
+        name = name[:-2] if name.endswith("[]") else name + "[]"
+    return name, typ, DESCRIPTIONS[i % len(DESCRIPTIONS)]
+
+
+def _contract_sheet(ws, rnd: random.Random, rows: int, codes: list) -> tuple:
+    """Devuelve la obligatoriedad de cada atributo de la petición y de la respuesta 200."""
+    ws.append(["Servicio", "customers-accounts", "Versión", "v1"])
+    ws.append([])
+    ws.append(["Atributo", "Tipo", "Obligatorio", "Entrada/Salida", "Descripción"])
+    request_flags, response_flags = [], []
+    for i in range(rows):
+        name, typ, desc = _attribute(rnd, i)
+        request_flags.append(rnd.choice(["Yes", "No"]))
+        ws.append([name, typ, request_flags[-1], "Entrada", desc])
+    ws.append([])
+
+    ws.append(["HTTP Status Code", "Alias", "Descripción"])
+    ws.append([200, "OK", "Operación exitosa"])
+    for code in codes:
+        ws.append([code, f"E{code}", f"Error {code} al procesar la petición"])
+    ws.append([])
+
+    ws.append(["Status Code 200"])
+    ws.append(["Atributo", "Tipo", "Obligatorio", "Entrada/Salida"])
+    for i in range(rows):
+        name, typ, _ = _attribute(rnd, i, "data.")
+        response_flags.append(rnd.choice(["Yes", "No"]))
+        ws.append([name, typ, response_flags[-1], "Salida"])
+    for code in codes:
+        ws.append([f"Status Code {code}"])
+        ws.append(["Atributo", "Tipo", "Obligatorio", "Entrada/Salida"])
+        for field in ("code", "message", "description"):
+            # De vez en cuando falta un campo o cambia el tipo (hallazgos esperables)
+            if rnd.random() < 0.03: continue
+            ws.append([field, "Number" if rnd.random() < 0.03 else "String", "Yes", "Salida"])
+    return request_flags, response_flags
+
+
+def _sql(kind: str, table: str, in_names: list, out_names: list, n_cols: int) -> str:
+    """
+    El SQL como lo pegan en la matriz: una sola celda con la sentencia en varias líneas.
+    Lleva las columnas mapeadas y se rellena con columnas no mapeadas hasta n_cols.
+    """
+    if kind == "SELECT":
+        cols = out_names + [f"extra_{i}" for i in range(max(0, n_cols - len(out_names)))]
+        lines = [f"SELECT t.{cols[0]},"] + [f"  t.{c}," for c in cols[1:]]
+        lines[-1] = lines[-1].rstrip(",")
+        return "\n".join(lines + [f"FROM {table} t", "WHERE t.id = ?"])
+    cols = in_names + [f"extra_{i}" for i in range(max(0, n_cols - len(in_names)))]
+    if kind == "INSERT":
+        return "\n".join([f"INSERT INTO {table} (", "  " + ", ".join(cols),
+                          ") VALUES (" + ", ".join("?" * len(cols)) + ")"])
+    sets = [f"  {c} = ?," for c in cols[1:]] or [f"  {cols[0]} = ?,"]
+    sets[-1] = sets[-1].rstrip(",")
+    return "\n".join([f"UPDATE {table} SET"] + sets + [f"WHERE {cols[0]} = ?"])
+
+
+def _backend_sheet(ws, rnd: random.Random, idx: int, rows: int, sql_columns: int, flags: tuple):
+    request_flags, response_flags = flags
+    ws.append(["Mapeo Transacción", f"TX{idx:04d}", "Servicio", "customers-accounts"])
+    ws.append(["Backend - Input"])
+    ws.append(["Atributo", "Tipo", "Atributo", "Tipo de dato", "Obligatoriedad", "Descripción"])
+    in_names = []
+    for i in range(rows):
+        name, typ, desc = _attribute(rnd, i)
+        column = f"col_{idx}_{i}" + ("[]" if name.endswith("[]") else "")
+        in_names.append(column)
+        ws.append([f"request.{name}", typ, column, "Array" if typ == "Array" else "String",
+                   request_flags[i], desc])
+
+    kind = ["SELECT", "INSERT", "UPDATE"][idx % 3]
+    ws.append(["Backend - Output"])
+    out_names = []
+    # Solo las lecturas devuelven datos
+    for i in range(rows // 2 if kind == "SELECT" else 0):
+        name, typ, desc = _attribute(rnd, i, "response.")
+        column = f"out_{idx}_{i}"
+        out_names.append(column)
+        ws.append([column, "String", name, typ, response_flags[i], desc])
+    ws.append([])
+
+    # ~10% de las columnas no aparecen en el SQL
+    in_sql = [c for c in in_names if rnd.random() > 0.1] or in_names
+    out_sql = [c for c in out_names if rnd.random() > 0.1] or out_names
+    ws.append([_sql(kind, f"esquema.tabla_{idx}", in_sql, out_sql, max(sql_columns, 1))])
+
+
+def generate_matrix(path: str, backend_sheets: int = 3, rows: int = 40, error_codes: int = 5,
+                    sql_columns: int = 20, seed: int = 0) -> str:
+    """Escribe la matriz en path y lo devuelve."""
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Contrato"
+    flags = _contract_sheet(ws, rnd, rows, _error_codes(error_codes))
+    for i in range(backend_sheets):
+        _backend_sheet(wb.create_sheet(f"Backend {i + 1}"), rnd, i, rows, sql_columns, flags)
+    wb.create_sheet("Notas").append(["Comentarios de la revisión"])
+    wb.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--sheets", type=int, default=3, help="Hojas de backend")
+    parser.add_argument("--rows", type=int, default=40, help="Filas de mapeo por hoja")
+    parser.add_argument("--codes", type=int, default=5, help="Códigos de error")
+    parser.add_argument("--sql-columns", type=int, default=20, help="Columnas mínimas por sentencia SQL")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    generate_matrix(args.path, args.sheets, args.rows, args.codes, args.sql_columns, args.seed)
+    print(args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmarks de los validadores sobre matrices sintéticas.
+
+Para cada escenario genera la matriz (bench/matrix_generator.py), mide cada validador por
+separado y run_vobo de punta a punta (mediana de --repeat ejecuciones tras una de calentamiento, sin cachés)
+y compara con bench/baselines.json. Sale con código 1 si algún tiempo supera su línea
+base en más de --tolerance (y de --min-delta-ms, para no saltar por ruido). Las líneas
+base dependen de la máquina: regrábalas con --save al cambiar de entorno.
+
+Los objetivos *_fake_llm usan el backend fake (llm/backends.py) con --llm-latency-ms por
+llamada: miden la concurrencia y el batching de los checks semánticos sin red.
+
+Uso:
+    python bench/run_benchmarks.py                      # compara con las líneas base
+    python bench/run_benchmarks.py --save               # regraba las líneas base
+    python bench/run_benchmarks.py --scenarios small --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Tiempos reproducibles: sin la API real (los objetivos con LLM usan el backend fake)
+# y sin cachés en disco
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["VOBO_LLM_BACKEND"] = "openai"
+os.environ["VOBO_CACHE"] = "0"
+
+from matrix_generator import generate_matrix  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+SCENARIOS = {
+    "small": {"backend_sheets": 3, "rows": 40, "error_codes": 5, "sql_columns": 20},
+    "medium": {"backend_sheets": 10, "rows": 300, "error_codes": 20, "sql_columns": 100},
+    "large": {"backend_sheets": 25, "rows": 1500, "error_codes": 60, "sql_columns": 400},
+}
+
+
+def _with_fake_llm(fn, latency_ms: float):
+    """fn con el backend fake activo (latencia fija + jitter determinista de la mitad)."""
+    from llm import openai_client
+    from llm.backends import FakeBackend
+
+    def run(path):
+        openai_client.set_backend(FakeBackend(latency_ms, latency_ms / 2))
+        try:
+            return fn(path)
+        finally:
+            openai_client.set_backend(None)
+    return run
+
+
+def _targets(llm_latency_ms: float) -> dict:
+    from validator.statuscode import validate_error_definitions
+    from validator.backend_mapping import validate_backend_mapping
+    from validator.bian_validation import validate_bian_alignment
+    from validator.vobo import run_vobo
+
+    return {
+        "statuscode": validate_error_definitions,
+        "backend": validate_backend_mapping,
+        "run_vobo": lambda path: run_vobo(path, use_cache=False),
+        "run_vobo_streaming": lambda path: run_vobo(path, streaming=True, use_cache=False),
+        "bian_fake_llm": _with_fake_llm(validate_bian_alignment, llm_latency_ms),
+        "run_vobo_fake_llm": _with_fake_llm(lambda path: run_vobo(path, use_cache=False, concurrent=True),
+                                            llm_latency_ms),
+    }
+
+
+def _matrix_path(name: str, params: dict) -> str:
+    """Las matrices se generan una vez por escenario y parámetros (mismo contenido con la misma semilla)."""
+    folder = os.path.join(tempfile.gettempdir(), "vobo-bench")
+    os.makedirs(folder, exist_ok=True)
+    tag = "-".join(f"{v}" for v in params.values())
+    path = os.path.join(folder, f"{name}-{tag}.xlsx")
+    if not os.path.exists(path):
+        generate_matrix(path, **params)
+    return path
+
+
+def run_scenario(name: str, repeat: int, llm_latency_ms: float) -> dict:
+    path = _matrix_path(name, SCENARIOS[name])
+    timings = {}
+    for target, fn in _targets(llm_latency_ms).items():
+        fn(path)  # calentamiento: importaciones perezosas y cachés del intérprete
+        samples = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            fn(path)
+            samples.append((time.perf_counter() - t) * 1000)
+        timings[target] = round(statistics.median(samples), 1)
+    return timings
+
+
+def compare(results: dict, baselines: dict, tolerance: float, min_delta_ms: float) -> list:
+    regressions = []
+    for scenario, timings in results.items():
+        for target, ms in timings.items():
+            base = baselines.get(scenario, {}).get(target)
+            if base is None: continue
+            if ms > base * (1 + tolerance) and ms - base > min_delta_ms:
+                regressions.append(f"{scenario}/{target}: {ms:.1f} ms (línea base {base:.1f} ms, +{(ms / base - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=0.35, help="Margen relativo sobre la línea base")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0, help="Diferencia mínima para contar como regresión")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0, help="Latencia por llamada del LLM fake")
+    parser.add_argument("--save", action="store_true", help="Guarda los tiempos como nuevas líneas base")
+    args = parser.parse_args()
+
+    results = {name: run_scenario(name, max(1, args.repeat), args.llm_latency_ms) for name in args.scenarios}
+    print(json.dumps(results, indent=2))
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+            f.write("\n")
+        print(f"Líneas base guardadas en {BASELINES_PATH}", file=sys.stderr)
+        return
+
+    regressions = compare(results, baselines, args.tolerance, args.min_delta_ms)
+    for r in regressions:
+        print(f"❌ {r}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark del parser SQL de las hojas de backend.
+
+Compara validator.sql_parser.parse_sql con el extractor por expresiones regulares al
+que sustituye (copiado aquí tal cual) sobre SQL generado de distintos tamaños, incluido
+un script sin VALUES que dispara el retroceso de los patrones perezosos. El extractor
+anterior solo ve la primera sentencia: en "script" el parser hace bastante más trabajo.
+
+Uso: python bench/sql_parser_bench.py [--sizes 100 1000 5000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from validator.backend_mapping import _loose_normalize  # noqa: E402
+from validator.sql_parser import parse_sql  # noqa: E402
+
+
+# =============================================================================
+# EXTRACTOR ANTERIOR (referencia)
+# =============================================================================
+
+def legacy_extract_sql_columns(sql_text: str) -> tuple[str, set]:
+    clean = re.sub(r"--.*", "", sql_text).replace("\n", " ").strip()
+    clean = re.sub(r"\s*=\s*", "=", clean)
+
+    cols = set()
+
+    if "INSERT INTO" in clean.upper():
+        m = re.search(r"INSERT\s+INTO\s+.*?\((.*?)\)\s*VALUES", clean, re.IGNORECASE)
+        if m:
+            for c in m.group(1).split(","):
+                if c.strip(): cols.add(_loose_normalize(c.strip()))
+            return "INSERT", cols
+
+    if "UPDATE" in clean.upper() and "SET" in clean.upper():
+        matches = re.findall(r"([a-zA-Z0-9_\.]+)=[\?a-zA-Z0-9_']", clean)
+        for m in matches:
+            cols.add(_loose_normalize(m))
+        return "INSERT", cols
+
+    if "DELETE" in clean.upper() and "FROM" in clean.upper():
+        matches = re.findall(r"([a-zA-Z0-9_\.]+)=[\?a-zA-Z0-9_']", clean)
+        for m in matches:
+            cols.add(_loose_normalize(m))
+        return "INSERT", cols
+
+    if "SELECT" in clean.upper():
+        m = re.search(r"SELECT\s+(.*?)\s+FROM", clean, re.IGNORECASE)
+        if m:
+            for c in m.group(1).split(","):
+                if not c.strip(): continue
+                for part in re.split(r"\s+AS\s+|\s+", c, flags=re.IGNORECASE):
+                    if part.upper() not in ["DISTINCT", "TOP", "ALL"]:
+                        cols.add(_loose_normalize(part))
+            return "SELECT", cols
+
+    return "UNKNOWN", set()
+
+
+# =============================================================================
+# SQL GENERADO
+# =============================================================================
+
+def gen_insert(n: int) -> str:
+    cols = ", ".join(f"campo_{i}" for i in range(n))
+    return f"INSERT INTO esquema.tabla ({cols}) VALUES ({', '.join('?' * n)})"
+
+
+def gen_select(n: int) -> str:
+    cols = ",\n  ".join(f"t.col_{i} AS alias_{i}" if i % 2 else f"UPPER(t.col_{i})" for i in range(n))
+    return f"-- consulta generada\nSELECT DISTINCT\n  {cols}\nFROM esquema.tabla t\nWHERE t.id = ?"
+
+
+def gen_script(n: int) -> str:
+    """n sentencias de los cuatro tipos, como un script pegado en la hoja."""
+    parts = []
+    for i in range(n):
+        parts.append([
+            f"INSERT INTO t{i} (a_{i}, b_{i}) VALUES (?, ?);",
+            f"UPDATE t{i} SET a_{i} = ?, b_{i} = ? WHERE id_{i} = ?;",
+            f"DELETE FROM t{i} WHERE id_{i} = ?;",
+            f"SELECT a_{i}, b_{i} AS bb FROM t{i} WHERE id_{i} = ?;",
+        ][i % 4])
+    return "\n".join(parts)
+
+
+def gen_unterminated(n: int) -> str:
+    """INSERT sin VALUES con muchos paréntesis: el patrón perezoso reintenta desde cada '('."""
+    return "INSERT INTO tabla " + " ".join(f"(c{i}, d{i})" for i in range(n))
+
+
+CASES = {"insert": gen_insert, "select": gen_select, "script": gen_script, "unterminated": gen_unterminated}
+
+
+def _best_ms(fn, text: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for case, gen in CASES.items():
+        for n in args.sizes:
+            text = gen(n)
+            results.append({
+                "case": case, "size": n, "chars": len(text),
+                "legacy_ms": round(_best_ms(legacy_extract_sql_columns, text, args.repeat), 2),
+                "parser_ms": round(_best_ms(parse_sql, text, args.repeat), 2),
+                "statements": len(parse_sql(text)),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
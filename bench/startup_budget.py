@@ -0,0 +1,98 @@
+"""
+Presupuesto de arranque de la app.
+
+Mide, en un intérprete limpio, lo que cuesta importar lo que app.py carga de forma
+eager (sus imports de nivel de módulo, leídos con ast; todo excepto streamlit) y comprueba que ningún módulo pesado se cuele en
+ese camino. Si streamlit está instalado, mide además el primer render y un rerun
+con AppTest. Sale con código 1 si se supera el presupuesto.
+
+Uso: python bench/startup_budget.py [--budget-ms 150] [--rerun-budget-ms 300]
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se carga aparte (AppTest): no cuenta en el presupuesto de importaciones
+EXCLUDED_IMPORTS = {"streamlit"}
+# No deben cargarse hasta que el usuario valide o el clasificador local dude
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "openai", "validator.vobo"]
+
+PROBE = """
+import json, sys, time
+t = time.perf_counter()
+for name in {imports!r}:
+    __import__(name)
+elapsed = (time.perf_counter() - t) * 1000
+print(json.dumps({{"import_ms": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def eager_imports(app_path: str = os.path.join(ROOT, "app.py")) -> list:
+    """Módulos que app.py importa a nivel de módulo (los de dentro de funciones son diferidos)."""
+    with open(app_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names.append(node.module)
+    return [n for n in dict.fromkeys(names) if n.split(".")[0] not in EXCLUDED_IMPORTS]
+
+
+def measure_imports() -> dict:
+    imports = eager_imports()
+    code = PROBE.format(imports=imports, heavy=HEAVY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return {"imports": imports, **json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def measure_app():
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    sys.path.insert(0, ROOT)
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"))
+    t = time.perf_counter()
+    at.run()
+    first = (time.perf_counter() - t) * 1000
+    t = time.perf_counter()
+    at.run()
+    rerun = (time.perf_counter() - t) * 1000
+    return {"first_paint_ms": first, "rerun_ms": rerun}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Importaciones eager (sin streamlit)")
+    parser.add_argument("--rerun-budget-ms", type=float, default=300.0, help="Rerun de la app con AppTest")
+    args = parser.parse_args()
+
+    report = measure_imports()
+    app = measure_app()
+    if app: report.update(app)
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["heavy"]:
+        failures.append(f"módulos pesados importados al arrancar: {', '.join(report['heavy'])}")
+    if report["import_ms"] > args.budget_ms:
+        failures.append(f"importaciones {report['import_ms']:.0f} ms > {args.budget_ms:.0f} ms")
+    if app and app["rerun_ms"] > args.rerun_budget_ms:
+        failures.append(f"rerun {app['rerun_ms']:.0f} ms > {args.rerun_budget_ms:.0f} ms")
+
+    for f in failures:
+        print(f"❌ {f}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
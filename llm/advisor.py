@@ -48,22 +48,164 @@ def _extract_attribute_candidates(user_message: str) -> List[str]:
     return out
 
 
-def _pick_relevant_errors(user_message: str, errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+# =============================================================================
+# ÍNDICE INVERTIDO DE HALLAZGOS
+# =============================================================================
+
+# Palabras del mensaje que no identifican ningún hallazgo
+QUERY_STOPWORDS = {
+    "explica", "explicar", "explicame", "explícame", "error", "errores", "hallazgo", "atributo",
+    "campo", "celda", "hoja", "del", "las", "los", "por", "favor", "que", "qué", "este", "esta",
+    "para", "con", "una", "uno", "sobre", "the",
+}
+# Segmentos de ruta que comparten casi todos los hallazgos: solo desempatan, nunca eligen
+GENERIC_ATTR_TERMS = {"code", "error", "errors", "data", "message", "description"}
+# Códigos HTTP dentro del atributo ("StatusCode 405", "Error 403.code")
+HTTP_CODE_RE = re.compile(r"[1-5]\d\d")
+# Similitud mínima (Dice sobre trigramas) para aceptar un término escrito con erratas
+FUZZY_MIN_SIMILARITY = 0.6
+FUZZY_MIN_LENGTH = 4
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _path_segments(attr: str) -> List[str]:
+    """'data.products[].id' -> ['data', 'products', 'id']."""
+    return [seg for seg in re.split(r"[.\[\]]+", attr) if seg]
+
+
+def _attr_words(attr: str) -> List[str]:
+    """'StatusCode 405' -> ['statuscode', '405']; 'Error 403.code' -> ['error', '403', 'code']."""
+    return re.findall(r"[a-z]+|\d+", _norm(attr))
+
+
+class IssueIndex:
+    """
+    Índice invertido de un resultado de validación, construido una vez por resultado:
+    término -> posiciones de los hallazgos, por atributo (completo, por segmento de la ruta y por
+    palabra), código HTTP, hoja, celda y categoría. Los atributos llevan además un índice de
+    trigramas para resolver los nombres escritos con erratas sin recorrer la lista de hallazgos.
+    """
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        self.errors = list(errors)
+        self.postings: Dict[tuple, List[int]] = {}  # (campo, término) -> posiciones
+        self.trigrams: Dict[str, set] = {}  # trigrama -> términos de atributo
+
+        for pos, e in enumerate(self.errors):
+            raw_attr = e.get("attribute", "")
+            attr = _norm_attr(raw_attr).lower()
+            if attr:
+                self._add("attr", attr, pos)
+                for seg in _path_segments(attr):
+                    self._add("attr", seg, pos)
+                for word in _attr_words(raw_attr):
+                    self._add("code" if HTTP_CODE_RE.fullmatch(word) else "attr", word, pos)
+            self._add("sheet", _norm(str(e.get("sheet", ""))), pos)
+            self._add("cell", _norm(str(e.get("cell", ""))), pos)
+            self._add("category", _norm(e.get("category") or ""), pos)
+
+        for field, term in self.postings:
+            if field != "attr" or term.isdigit(): continue
+            for gram in _trigrams(term):
+                self.trigrams.setdefault(gram, set()).add(term)
+
+    def _add(self, field: str, term: str, pos: int):
+        if not term: return
+        postings = self.postings.setdefault((field, term), [])
+        if not postings or postings[-1] != pos:
+            postings.append(pos)
+
+    def fuzzy(self, term: str) -> List[str]:
+        """Términos de atributo más parecidos a `term` (vacío si ninguno supera el umbral)."""
+        grams = _trigrams(term)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        best, picked = FUZZY_MIN_SIMILARITY, []
+        for candidate, n in shared.items():
+            score = 2 * n / (len(grams) + len(_trigrams(candidate)))
+            if score > best:
+                best, picked = score, [candidate]
+            elif score == best:
+                picked.append(candidate)
+        return picked
+
+    def lookup(self, user_message: str) -> List[Dict[str, Any]]:
+        """
+        Hallazgos que mejor coinciden con el mensaje: cada referencia del mensaje (código HTTP,
+        atributo, hoja, celda o categoría) suma un punto a los hallazgos que apunta y gana el
+        máximo. Un código HTTP exacto pesa más que el resto, y las palabras genéricas de ruta
+        ("code", "data"...) solo desempatan entre hallazgos ya elegidos por otra referencia.
+        Un atributo sin coincidencia exacta se busca por trigramas. Lista vacía si nada coincide.
+        """
+        kinds = ("code", "specific", "generic")
+        scores: Dict[int, list] = {}
+        for kind, positions in self._query_matches(user_message):
+            for pos in positions:
+                scores.setdefault(pos, [0, 0, 0])[kinds.index(kind)] += 1
+        scores = {pos: tuple(s) for pos, s in scores.items() if s[0] or s[1]}
+        if not scores: return []
+
+        top = max(scores.values())
+        return [self.errors[pos] for pos in sorted(p for p, s in scores.items() if s == top)]
+
+    def _query_matches(self, user_message: str):
+        """
+        Por cada referencia del mensaje, (tipo, posiciones de los hallazgos que apunta); el tipo
+        es "code" (código HTTP), "generic" (palabra de GENERIC_ATTR_TERMS) o "specific".
+        """
+        msg = _norm(user_message)
+        words = [w.strip(".") for w in re.findall(r"[\wáéíóúñ\[\].]+", msg)]
+
+        for sheet in _extract_sheet_numbers(user_message):
+            yield "specific", set(self.postings.get(("sheet", _norm(sheet)), ()))
+        # Nombres de hoja de una a tres palabras ("Backend 3", "Contrato")
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                positions = self.postings.get(("sheet", " ".join(words[i:i + n])))
+                if positions: yield "specific", set(positions)
+
+        candidates = [c.lower() for c in _extract_attribute_candidates(user_message)]
+        candidates += [w for w in words if w not in QUERY_STOPWORDS]
+        seen = set()
+        for term in candidates:
+            if len(term) < 2 or term in seen: continue
+            seen.add(term)
+            for field in ("cell", "category"):
+                positions = self.postings.get((field, term))
+                if positions: yield "specific", set(positions)
+
+            positions = self.postings.get(("code", term))
+            if positions: yield "code", set(positions)
+
+            positions = self.postings.get(("attr", term))
+            if positions:
+                yield ("generic" if term in GENERIC_ATTR_TERMS else "specific"), set(positions)
+            elif len(term) >= FUZZY_MIN_LENGTH and not term.isdigit():
+                similar = self.fuzzy(term)
+                matched = set()
+                for s in similar:
+                    matched.update(self.postings[("attr", s)])
+                if matched:
+                    yield ("generic" if all(s in GENERIC_ATTR_TERMS for s in similar) else "specific"), matched
+
+
+def build_issue_index(errors: List[Dict[str, Any]]) -> IssueIndex:
+    return IssueIndex(errors)
+
+
+def _pick_relevant_errors(user_message: str, errors: List[Dict[str, Any]],
+                          index: IssueIndex = None) -> List[Dict[str, Any]]:
     """Selecciona el error más probable basado en lo que escribe el usuario."""
-    attrs = set(_extract_attribute_candidates(user_message))
-    sheets = set(_extract_sheet_numbers(user_message))
-
-    picked = []
-    for e in errors:
-        e_attr = _norm_attr(e.get("attribute", ""))
-        e_sheet = str(e.get("sheet", "")).strip()
-
-        if attrs and e_attr in attrs:
-            picked.append(e)
-            continue
-        if sheets and e_sheet in sheets:
-            picked.append(e)
-            continue
+    if index is None:
+        index = IssueIndex(errors)
+    picked = index.lookup(user_message)
 
     if picked:
         seen = set()
@@ -168,8 +310,9 @@ def _explain_one_error(e: Dict[str, Any]) -> str:
     )
 
 
-def explain_errors(user_message: str, errors: List[Dict[str, Any]]) -> str:
-    picked = _pick_relevant_errors(user_message, errors)
+def explain_errors(user_message: str, errors: List[Dict[str, Any]], index: IssueIndex = None) -> str:
+    """index: el IssueIndex de `errors` si ya se construyó (uno por resultado de validación)."""
+    picked = _pick_relevant_errors(user_message, errors, index)
 
     blocks = []
     for e in picked:
@@ -0,0 +1,259 @@
+"""
+Backends de LLM intercambiables.
+
+Todos entregan clientes con la forma de la SDK de OpenAI (client.chat.completions.create(...)
+devuelve un objeto con choices[0].message.content y usage), así que los validadores no
+distinguen cuál está activo:
+
+- OpenAIBackend: la API real (requiere OPENAI_API_KEY).
+- CassetteBackend: graba las respuestas reales en un archivo JSONL ("record") o las
+  reproduce sin red ("replay"), opcionalmente con la latencia grabada.
+- FakeBackend: respuestas deterministas con latencia configurable, para medir la
+  concurrencia, el batching y las cachés de los checks semánticos sin red.
+
+El backend activo se elige con VOBO_LLM_BACKEND (openai | record | replay | fake) o con
+openai_client.set_backend().
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import types
+from functools import lru_cache
+
+CASSETTE_NAME = "llm_cassette.jsonl"
+
+
+def request_key(kwargs: dict) -> str:
+    """Huella de una petición: lo que determina la respuesta (modelo, mensajes, parámetros)."""
+    raw = json.dumps(kwargs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _response(content: str, prompt_tokens: int = None, completion_tokens: int = None):
+    """Respuesta mínima con la forma de ChatCompletion."""
+    message = types.SimpleNamespace(role="assistant", content=content)
+    usage = types.SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=(prompt_tokens or 0) + (completion_tokens or 0))
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                                 usage=usage)
+
+
+def _client(create, close=None):
+    """Objeto client.chat.completions.create(...) alrededor de una función."""
+    completions = types.SimpleNamespace(create=create)
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    if close is not None:
+        client.close = close
+    return client
+
+
+async def _noop_close():
+    pass
+
+
+# =============================================================================
+# OPENAI
+# =============================================================================
+
+class OpenAIBackend:
+    name = "openai"
+
+    def available(self) -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    def client(self):
+        return _openai_client() if self.available() else None
+
+    def async_client(self):
+        # No se cachea: su pool de conexiones queda ligado al event loop que lo usa
+        if not self.available(): return None
+        from openai import AsyncOpenAI
+        return AsyncOpenAI()
+
+
+@lru_cache(maxsize=1)
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI()
+
+
+# =============================================================================
+# FAKE DETERMINISTA
+# =============================================================================
+
+def default_fake_reply(kwargs: dict) -> str:
+    """Sin hallazgos: {"issues": []} en las peticiones JSON y OUT_OF_SCOPE en las de texto."""
+    if (kwargs.get("response_format") or {}).get("type") == "json_object":
+        return json.dumps({"issues": []})
+    return "OUT_OF_SCOPE"
+
+
+class FakeBackend:
+    """
+    latency_ms (+ hasta jitter_ms) por llamada. El jitter sale del hash de la petición, no de
+    un generador compartido: la misma petición tarda lo mismo en cualquier orden de ejecución.
+    reply(kwargs) -> str decide el contenido de la respuesta.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, reply=default_fake_reply):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.reply = reply
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return True
+
+    def _delay(self, key: str) -> float:
+        jitter = int(key[:8], 16) / 0xFFFFFFFF * self.jitter_ms if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000
+
+    def _answer(self, kwargs: dict):
+        with self._lock:
+            self.calls += 1
+        content = self.reply(kwargs)
+        # Aproximación habitual de ~4 caracteres por token, para que la telemetría tenga cifras
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in kwargs.get("messages", []))
+        return _response(content, prompt_chars // 4, len(content) // 4)
+
+    def client(self):
+        def create(**kwargs):
+            time.sleep(self._delay(request_key(kwargs)))
+            return self._answer(kwargs)
+        return _client(create)
+
+    def async_client(self):
+        async def create(**kwargs):
+            await asyncio.sleep(self._delay(request_key(kwargs)))
+            return self._answer(kwargs)
+        return _client(create, _noop_close)
+
+
+# =============================================================================
+# CASSETTE (GRABAR / REPRODUCIR)
+# =============================================================================
+
+class CassetteMiss(LookupError):
+    """La petición no está grabada en el cassette (modo replay)."""
+
+
+class CassetteBackend:
+    """
+    mode="record": reenvía cada petición a `inner` y añade la respuesta al cassette.
+    mode="replay": responde desde el cassette sin red; una petición no grabada lanza
+    CassetteMiss, que los validadores tratan como un fallo del LLM (resultado incompleto).
+    Con replay_latency=True se duerme la latencia grabada de cada respuesta.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", inner=None, replay_latency: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Modo de cassette desconocido: {mode}")
+        self.path = path
+        self.mode = mode
+        self.name = mode
+        self.inner = inner or OpenAIBackend()
+        self.replay_latency = replay_latency
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self) -> dict:
+        entries = {}
+        if not os.path.exists(self.path): return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip(): continue
+                entry = json.loads(line)
+                entries[entry["key"]] = entry
+        return entries
+
+    def _store(self, key: str, response, latency_ms: float):
+        usage = getattr(response, "usage", None)
+        entry = {
+            "key": key,
+            "content": response.choices[0].message.content,
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "latency_ms": round(latency_ms, 1),
+        }
+        with self._lock:
+            if key in self._entries: return
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _lookup(self, key: str) -> dict:
+        entry = self._entries.get(key)
+        if entry is None:
+            raise CassetteMiss(key)
+        return entry
+
+    def available(self) -> bool:
+        return self.mode == "replay" or self.inner.available()
+
+    def client(self):
+        if self.mode == "record":
+            inner = self.inner.client()
+            if inner is None: return None
+
+            def record(**kwargs):
+                start = time.perf_counter()
+                response = inner.chat.completions.create(**kwargs)
+                self._store(request_key(kwargs), response, (time.perf_counter() - start) * 1000)
+                return response
+            return _client(record)
+
+        def replay(**kwargs):
+            entry = self._lookup(request_key(kwargs))
+            if self.replay_latency:
+                time.sleep(entry["latency_ms"] / 1000)
+            return _response(entry["content"], entry["prompt_tokens"], entry["completion_tokens"])
+        return _client(replay)
+
+    def async_client(self):
+        if self.mode == "record":
+            inner = self.inner.async_client()
+            if inner is None: return None
+
+            async def record(**kwargs):
+                start = time.perf_counter()
+                response = await inner.chat.completions.create(**kwargs)
+                self._store(request_key(kwargs), response, (time.perf_counter() - start) * 1000)
+                return response
+            return _client(record, inner.close)
+
+        async def replay(**kwargs):
+            entry = self._lookup(request_key(kwargs))
+            if self.replay_latency:
+                await asyncio.sleep(entry["latency_ms"] / 1000)
+            return _response(entry["content"], entry["prompt_tokens"], entry["completion_tokens"])
+        return _client(replay, _noop_close)
+
+
+# =============================================================================
+# SELECCIÓN POR ENTORNO
+# =============================================================================
+
+def backend_from_env():
+    """
+    VOBO_LLM_BACKEND: openai (por defecto) | record | replay | fake.
+    VOBO_LLM_CASSETTE: archivo del cassette (por defecto llm_cassette.jsonl junto a la caché).
+    VOBO_REPLAY_LATENCY=1: el replay duerme la latencia grabada.
+    VOBO_FAKE_LATENCY_MS / VOBO_FAKE_JITTER_MS: latencia del fake.
+    """
+    kind = os.getenv("VOBO_LLM_BACKEND", "openai").strip().lower()
+    if kind == "openai":
+        return OpenAIBackend()
+    if kind == "fake":
+        return FakeBackend(float(os.getenv("VOBO_FAKE_LATENCY_MS", "0")),
+                           float(os.getenv("VOBO_FAKE_JITTER_MS", "0")))
+    if kind in ("record", "replay"):
+        default_dir = os.getenv("VOBO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "vobo"))
+        path = os.getenv("VOBO_LLM_CASSETTE") or os.path.join(default_dir, CASSETTE_NAME)
+        return CassetteBackend(path, kind, replay_latency=os.getenv("VOBO_REPLAY_LATENCY", "0") == "1")
+    raise ValueError(f"VOBO_LLM_BACKEND desconocido: {kind}")
@@ -1,11 +1,12 @@
 # llm/intent_classifier.py
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import re
+import json
+import math
+import unicodedata
+from functools import lru_cache
 
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from llm import openai_client
 
 SYSTEM_PROMPT = """
 Eres un clasificador de intención para un agente de gobierno técnico.
@@ -17,6 +18,8 @@ Devuelve SOLO una de estas etiquetas exactas:
 - OUT_OF_SCOPE
 """
 
+LABELS = ("VALIDATE_VOBO", "EXPLAIN_ERROR", "HELP", "OUT_OF_SCOPE")
+
 KEYWORD_VALIDATE = {
     "valida",
     "validar",
@@ -27,32 +30,106 @@ KEYWORD_VALIDATE = {
     "vobo",
 }
 
-def classify_intent(user_message: str) -> str:
-    text = user_message.lower().strip()
+# Modelo local (Naive Bayes sobre n-gramas de caracteres), entrenado con llm/train_intent_model.py
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "intent_model.json")
+# Por debajo de esta probabilidad se consulta al LLM
+CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.7"))
+# Naive Bayes sobre n-gramas solapados es sobreconfiado: se promedia por n-grama y se
+# re-escala (valor ajustado con leave-one-out sobre intent_examples.json)
+SHARPNESS = 4.0
+
+# =============================================================================
+# CLASIFICADOR LOCAL
+# =============================================================================
+
+def _normalize_message(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _char_ngrams(text: str, n_min: int = 2, n_max: int = 4) -> list:
+    padded = f" {text} "
+    return [padded[i:i + n] for n in range(n_min, n_max + 1) for i in range(len(padded) - n + 1)]
+
+
+@lru_cache(maxsize=1)
+def _load_model():
+    """Convierte los conteos guardados en log-probabilidades (suavizado de Laplace)."""
+    with open(MODEL_PATH, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    alpha = data["alpha"]
+    vocab = data["vocab_size"]
+    total_docs = sum(lbl["docs"] for lbl in data["labels"].values())
+
+    model = {}
+    for label, lbl in data["labels"].items():
+        denom = lbl["total"] + alpha * vocab
+        model[label] = (
+            math.log(lbl["docs"] / total_docs),
+            {ng: math.log((c + alpha) / denom) for ng, c in lbl["counts"].items()},
+            math.log(alpha / denom),
+        )
+    return model
+
+
+def classify_local(user_message: str) -> tuple[str, float]:
+    """Etiqueta más probable y su probabilidad posterior, sin red."""
+    grams = _char_ngrams(_normalize_message(user_message))
+    scores = {}
+    for label, (prior, loglik, unseen) in _load_model().items():
+        total = prior + sum(loglik.get(g, unseen) for g in grams)
+        scores[label] = total / max(len(grams), 1) * SHARPNESS
+
+    best = max(scores, key=scores.get)
+    norm = sum(math.exp(s - scores[best]) for s in scores.values())
+    return best, 1.0 / norm
+
 
+# =============================================================================
+# CLASIFICACIÓN
+# =============================================================================
+
+def _classify_with_llm(user_message: str) -> str | None:
+    client = openai_client.get_client()
+    if client is None: return None
+
+    try:
+        response = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0
+        )
+    except Exception:
+        return None
+
+    intent = response.choices[0].message.content.strip()
+
+    if intent not in LABELS:
+        return "OUT_OF_SCOPE"
+
+    return intent
+
+
+@lru_cache(maxsize=1024)
+def _classify_normalized(text: str) -> str:
     # 🔥 ATAJO DETERMINISTA (CRÍTICO)
     for kw in KEYWORD_VALIDATE:
         if kw in text:
             return "VALIDATE_VOBO"
 
-    # --- fallback LLM ---
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_message}
-        ],
-        temperature=0
-    )
+    label, confidence = classify_local(text)
+    if confidence >= CONFIDENCE_THRESHOLD:
+        return label
 
-    intent = response.choices[0].message.content.strip()
+    # --- fallback LLM (solo mensajes ambiguos) ---
+    return _classify_with_llm(text) or label
 
-    if intent not in {
-        "VALIDATE_VOBO",
-        "EXPLAIN_ERROR",
-        "HELP",
-        "OUT_OF_SCOPE"
-    }:
-        return "OUT_OF_SCOPE"
 
-    return intent
+def classify_intent(user_message: str) -> str:
+    # Memoizado por mensaje normalizado: repetir la misma frase no vuelve a clasificar
+    return _classify_normalized(user_message.lower().strip())
@@ -0,0 +1,81 @@
+# llm/openai_client.py
+"""
+Clientes LLM compartidos por todo el proceso.
+Nada se importa ni se construye hasta el primer uso: importar los validadores o el
+clasificador no arrastra `openai` ni abre conexiones.
+Los clientes salen del backend activo (ver llm/backends.py): OpenAI, cassette o fake.
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from llm import backends
+
+load_dotenv()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def has_api_key() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def get_backend():
+    """Backend activo: el fijado con set_backend() o el de VOBO_LLM_BACKEND."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = backends.backend_from_env()
+        return _backend
+
+
+def set_backend(backend) -> None:
+    """Sustituye el backend del proceso (None vuelve a leer VOBO_LLM_BACKEND)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def llm_mode() -> str:
+    """
+    "off" sin LLM disponible; si no, el nombre del backend. Va en las claves de caché:
+    los hallazgos semánticos dependen de quién respondió.
+    """
+    backend = get_backend()
+    return backend.name if backend.available() else "off"
+
+
+def get_client():
+    """Cliente síncrono compartido; None si el backend no está disponible (p.ej. sin API key)."""
+    return get_backend().client()
+
+
+def new_async_client():
+    """
+    Cliente asíncrono nuevo (None si el backend no está disponible). No se cachea: su pool de
+    conexiones queda ligado al event loop que lo usa, y cada asyncio.run() crea uno distinto.
+    """
+    return get_backend().async_client()
+
+
+def chat_completion(client, **kwargs):
+    """
+    chat.completions.create que devuelve además los reintentos que hizo el SDK
+    (vía with_raw_response; 0 con clientes que no la exponen).
+    """
+    raw_api = getattr(client.chat.completions, "with_raw_response", None)
+    if raw_api is None:
+        return client.chat.completions.create(**kwargs), 0
+    raw = raw_api.create(**kwargs)
+    return raw.parse(), getattr(raw, "retries_taken", 0)
+
+
+async def chat_completion_async(aclient, **kwargs):
+    """Versión asíncrona de chat_completion."""
+    raw_api = getattr(aclient.chat.completions, "with_raw_response", None)
+    if raw_api is None:
+        return await aclient.chat.completions.create(**kwargs), 0
+    raw = await raw_api.create(**kwargs)
+    return raw.parse(), getattr(raw, "retries_taken", 0)
@@ -0,0 +1,46 @@
+# llm/train_intent_model.py
+"""
+Entrena el clasificador local de intención a partir de llm/intent_examples.json
+y escribe llm/intent_model.json (conteos de n-gramas por etiqueta).
+
+Uso: python -m llm.train_intent_model
+"""
+import os
+import json
+from collections import Counter
+
+from llm.intent_classifier import LABELS, MODEL_PATH, _char_ngrams, _normalize_message
+
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "intent_examples.json")
+ALPHA = 0.1
+
+
+def train(examples: dict) -> dict:
+    labels = {}
+    vocab = set()
+    for label in LABELS:
+        counts = Counter()
+        for text in examples.get(label, []):
+            counts.update(_char_ngrams(_normalize_message(text)))
+        vocab.update(counts)
+        labels[label] = {
+            "docs": len(examples.get(label, [])),
+            "total": sum(counts.values()),
+            "counts": dict(sorted(counts.items())),
+        }
+    return {"alpha": ALPHA, "vocab_size": len(vocab), "labels": labels}
+
+
+def main():
+    with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+
+    model = train(examples)
+    with open(MODEL_PATH, "w", encoding="utf-8") as f:
+        json.dump(model, f, ensure_ascii=False, separators=(",", ":"))
+
+    print(f"Modelo guardado en {MODEL_PATH} ({model['vocab_size']} n-gramas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
-import pandas as pd
+import itertools
 import re
+import pandas as pd
+
+from validator.workbook import Workbook, load_workbook
+from validator.grid import SheetGrid, columns, first_row
+from validator import events
+from validator.cache import cached_sheet_issues
+from validator.sql_parser import parse_sql
+from validator.issue import Issue
 
 TYPE_FAMILIES = {
     "string": "TEXT", "varchar": "TEXT", "char": "TEXT", "text": "TEXT", "nvarchar": "TEXT", "alphanumeric": "TEXT",
@@ -52,6 +60,23 @@ def _get_type_family(type_str: str) -> str:
     return TYPE_FAMILIES.get(clean, "UNKNOWN")
 
 
+# Raíz con la que las hojas de backend nombran el cuerpo (request.customerId = customerId)
+BODY_ROOTS = ("request.", "response.")
+STATUS_BLOCK_RE = re.compile(r"status\s*code\s*[:=]?\s*(\d+)")
+
+
+def _index_key(text: str) -> str:
+    """
+    Clave del índice de atributos: la ruta completa normalizada (minúsculas, sin espacios ni
+    marcas de array: data.items[].id = data.items.id), sin la raíz request./response.
+    """
+    if not isinstance(text, str): return ""
+    key = text.strip().lower().replace(" ", "").replace("[]", "")
+    for root in BODY_ROOTS:
+        if key.startswith(root): return key[len(root):]
+    return key
+
+
 def _is_mandatory(val: str) -> bool:
     v = _normalize(str(val))
     return v in ["si", "yes", "s", "y", "true", "requerido", "required", "mandatory", "mandatorio", "1"]
@@ -66,48 +91,121 @@ def _validate_array_syntax(attr_name, dtype, sheet, issues_list, cell_ref=""):
     is_array = "array" in dt
 
     if has_brackets_at_end and not is_array:
-        issues_list.append({
-            "sheet": sheet, "attribute": name, "level": "WARN", "category": "SYNTAX",
-            "cell": cell_ref,
+        issues_list.append(Issue(
+            sheet=sheet, attribute=name, level="WARN", category="SYNTAX",
+            cell=cell_ref,
             # TEXTO UNIFICADO
-            "message": f"Sintaxis: El nombre termina en '[]' pero el tipo es '{dtype}'. Debería ser 'Array'."
-        })
+            message=f"Sintaxis: El nombre termina en '[]' pero el tipo es '{dtype}'. Debería ser 'Array'."
+        ))
     elif is_array and not has_brackets_at_end:
-        issues_list.append({
-            "sheet": sheet, "attribute": name, "level": "WARN", "category": "SYNTAX",
-            "cell": cell_ref,
+        issues_list.append(Issue(
+            sheet=sheet, attribute=name, level="WARN", category="SYNTAX",
+            cell=cell_ref,
             # TEXTO UNIFICADO
-            "message": f"Sintaxis: El tipo es 'Array' pero no termina en '[]'."
-        })
-
-
-def _find_table_structure(df: pd.DataFrame):
-    ATTR = ["atributo", "campo", "field", "name", "nombre", "column"]
-    TYPE = ["tipo", "type", "datatype", "formato"]
-    OBLIG = ["obligatoriedad", "requerido", "mandatory", "required", "nulo"]
-
-    for i, row in df.iterrows():
-        r = [str(v).strip().lower() for v in row]
-        attr = [x for x, v in enumerate(r) if any(k == v for k in ATTR)]
-        typ = [x for x, v in enumerate(r) if any(k in v for k in TYPE) and "cambio" not in v]
-        obl = [x for x, v in enumerate(r) if any(k in v for k in OBLIG)]
-        if attr and typ: return i, attr, typ, obl
-
-    return None, [], [], []
-
-
-def _load_contract_definitions(df: pd.DataFrame, sheet_name: str, issues: list) -> dict:
-    contract_map = {}
-    header, attr_c, type_c, obl_c = _find_table_structure(df)
+            message=f"Sintaxis: El tipo es 'Array' pero no termina en '[]'."
+        ))
+
+
+HEADER_ATTR = ["atributo", "campo", "field", "name", "nombre", "column"]
+HEADER_TYPE = ["tipo", "type", "datatype", "formato"]
+HEADER_OBLIG = ["obligatoriedad", "obligatorio", "requerido", "mandatory", "required", "nulo"]
+
+
+def _match_header_row(row):
+    r = [str(v).strip().lower() for v in row]
+    attr = [x for x, v in enumerate(r) if any(k == v for k in HEADER_ATTR)]
+    typ = [x for x, v in enumerate(r) if any(k in v for k in HEADER_TYPE) and "cambio" not in v]
+    obl = [x for x, v in enumerate(r) if any(k in v for k in HEADER_OBLIG)]
+    if attr and typ: return attr, typ, obl
+    return None
+
+
+def _find_table_structure(df: pd.DataFrame, grid: SheetGrid = None):
+    """Primera fila con columna de atributo (exacta) y de tipo; se resuelve con máscaras sobre la rejilla."""
+    if grid is None: grid = SheetGrid(df)
+
+    attr = grid.equals_any(HEADER_ATTR)
+    typ = grid.contains_any(HEADER_TYPE) & ~grid.contains("cambio")
+    i = first_row(attr.any(axis=1) & typ.any(axis=1))
+    if i is None: return None, [], [], []
+
+    obl = grid.contains_any(HEADER_OBLIG)
+    return i, columns(attr[i]), columns(typ[i]), columns(obl[i])
+
+
+def _scan_table_structure(rows):
+    """
+    Igual que _find_table_structure pero sobre un iterador de filas (modo streaming).
+    Devuelve además las filas ya leídas hasta la cabecera, para poder re-encadenarlas.
+    """
+    head = []
+    for i, row in enumerate(rows):
+        head.append(row)
+        match = _match_header_row(row)
+        if match: return (i, *match), head
+
+    return (None, [], [], []), head
+
+
+SQL_NOISE = ['nan', 'none', 'n/a']
+
+
+def _region_text(rows) -> str:
+    """Texto útil de las celdas de las filas dadas, en orden de lectura (modo streaming)."""
+    parts = []
+    for row in rows:
+        for val in row:
+            val = str(val).strip()
+            if val and val.lower() not in SQL_NOISE:
+                parts.append(val)
+    return " ".join(parts)
+
+
+def _extract_sql_region(df: pd.DataFrame, start_row: int) -> str:
+    """
+    Texto del bloque SQL: solo las celdas desde la fila donde empieza, aplanadas por filas
+    de una vez (sin acceso celda a celda y sin mezclar el texto de la tabla de mapeo).
+    """
+    cells = pd.Series(df.iloc[start_row:].to_numpy(dtype=object).ravel(), dtype=object)
+    cells = cells[cells.notna()].astype(str).str.strip()
+    cells = cells[(cells != "") & ~cells.str.lower().isin(SQL_NOISE)]
+    return " ".join(cells)
+
+
+def _contract_section(row, current: str) -> str:
+    """
+    Sección del contrato a la que pertenece la fila: la tabla de la petición ("INPUT"), el cuerpo
+    de una respuesta 2xx ("OUTPUT"), o algo que no se cruza con el backend ("OTHER": bloques de
+    error y la tabla resumen de códigos).
+    """
+    text = " ".join(str(v) for v in row).lower()
+    match = STATUS_BLOCK_RE.search(text)
+    if match:
+        return "OUTPUT" if 200 <= int(match.group(1)) < 300 else "OTHER"
+    if "http status code" in text:
+        return "OTHER"
+    return current
+
+
+def _load_contract_definitions(df: pd.DataFrame, sheet_name: str, issues: list, grid: SheetGrid = None) -> dict:
+    """
+    Definiciones del contrato para el cruce con el backend: {"INPUT": {clave: [def]}, "OUTPUT": {...}}.
+    Una clave puede tener varias definiciones (se guardan todas, ninguna pisa a otra). En OUTPUT
+    cada ruta se indexa también sin su primer segmento (sobre de la respuesta, p.ej. data.).
+    """
+    contract_map = {"INPUT": {}, "OUTPUT": {}}
+    header, attr_c, type_c, obl_c = _find_table_structure(df, grid)
     if header is None: return {}
 
     idx_a = attr_c[0]
     idx_t = type_c[0]
     idx_o = obl_c[0] if obl_c else None
 
+    section = "INPUT"
     for i in range(len(df)):
         if i == header: continue
         row = df.iloc[i]
+        section = _contract_section(row, section)
         try:
             raw_a = str(row.iloc[idx_a]).strip()
             raw_t = str(row.iloc[idx_t]).strip()
@@ -123,191 +221,294 @@ def _load_contract_definitions(df: pd.DataFrame, sheet_name: str, issues: list)
         _validate_array_syntax(raw_a, raw_t, sheet_name, issues, cell_ref=current_cell)
 
         fam = _get_type_family(raw_t)
-        if fam != "UNKNOWN" or _normalize(raw_o) in ["yes", "no", "si"]:
-            contract_map[norm] = {"original_name": raw_a, "type": raw_t, "mandatory": _is_mandatory(raw_o)}
+        if section != "OTHER" and (fam != "UNKNOWN" or _normalize(raw_o) in ["yes", "no", "si"]):
+            definition = {"original_name": raw_a, "type": raw_t, "family": fam,
+                          "mandatory": _is_mandatory(raw_o), "cell": current_cell}
+            key = _index_key(raw_a)
+            keys = [key]
+            if section == "OUTPUT" and "." in key:
+                keys.append(key.split(".", 1)[1])
+            for k in keys:
+                contract_map[section].setdefault(k, []).append(definition)
     return contract_map
 
 
+def _contract_side(row, section: str, a_cols, t_cols, o_cols):
+    """
+    Atributo del contrato en una fila de mapeo: en Input es el origen (primera columna de atributo)
+    y en Output el destino (segunda). Devuelve (nombre, tipo, obligatorio, columna) o None;
+    obligatorio es None si la hoja no tiene columna de obligatoriedad.
+    """
+    side = 0 if section == "INPUT" else 1
+    if len(a_cols) <= side: return None
+    col = a_cols[side]
+    try:
+        raw = str(row[col]).strip()
+        raw_t = str(row[t_cols[side]]).strip() if len(t_cols) > side else ""
+        raw_o = str(row[o_cols[0]]) if o_cols else None
+    except IndexError:
+        return None
+
+    if not raw or raw.lower() in ["nan", "n/a"] or _loose_normalize(raw) in KEYWORDS_TO_SKIP: return None
+    return raw, raw_t, (None if raw_o is None else _is_mandatory(raw_o)), col
+
+
 # =============================================================================
-# SQL PARSERS
+# ÍNDICE DE ATRIBUTOS (CRUCE CONTRATO / BACKEND)
 # =============================================================================
+# Cada hoja de backend aporta sus atributos del lado contrato como filas
+# [sección, clave, nombre, celda, familia de tipo, obligatorio]. Se indexan por clave una sola vez
+# y cada ocurrencia se cruza con las definiciones de su misma sección del contrato (Input con la
+# petición, Output con la respuesta 2xx) por búsqueda en dict (hash join): el coste es lineal en
+# el total de ocurrencias, sin comparar hojas contra hojas.
+
+def _build_attribute_index(sheet_attributes: dict) -> dict:
+    """clave -> [(hoja, sección, nombre, celda, familia, obligatorio)] de todas las hojas de backend."""
+    index = {}
+    for sheet, attributes in sheet_attributes.items():
+        for section, key, name, cell, family, mandatory in attributes:
+            index.setdefault(key, []).append((sheet, section, name, cell, family, mandatory))
+    return index
+
+
+def _cross_check(c_defs: dict, contract_sheet, sheet_attributes: dict) -> dict:
+    """
+    CONTRACT_MISMATCH (familia de tipo distinta), CONSISTENCY (obligatorio en el contrato pero no
+    en la hoja) y UNDEFINED_ATTRIBUTE (ni en el contrato ni en otra hoja como variable de paso).
+    Son heurísticos, así que todos salen como WARN y no bloquean el VoBo.
+    Devuelve los hallazgos agrupados por hoja, en el orden de las hojas.
+    """
+    issues = {sheet: [] for sheet in sheet_attributes}
+    for key, occurrences in _build_attribute_index(sheet_attributes).items():
+        # Variable de paso: sale de una hoja y se usa en otra aunque no esté en el contrato
+        shared = len({o[0] for o in occurrences}) > 1
+        for sheet, section, name, cell, family, mandatory in occurrences:
+            # Sección que el contrato no define (p.ej. sin bloque 2xx): nada contra qué cruzar
+            if not c_defs.get(section): continue
+            definitions = c_defs[section].get(key)
+            if not definitions:
+                if not shared:
+                    issues[sheet].append(Issue(
+                        sheet=sheet, attribute=name, cell=cell, level="WARN", category="UNDEFINED_ATTRIBUTE",
+                        message=f"El atributo no está definido en el contrato ({contract_sheet}) ni se usa en otra hoja."
+                    ))
+                continue
 
-def _extract_sql_columns(sql_text: str) -> tuple[str, set]:
-    clean = re.sub(r"--.*", "", sql_text).replace("\n", " ").strip()
-    clean = re.sub(r"\s*=\s*", "=", clean)
+            # Con varias definiciones para la misma ruta basta con que una sea compatible
+            typed = [d for d in definitions if d["family"] != "UNKNOWN"]
+            if family != "UNKNOWN" and typed and all(d["family"] != family for d in typed):
+                issues[sheet].append(Issue(
+                    sheet=sheet, attribute=name, cell=cell, level="WARN", category="CONTRACT_MISMATCH",
+                    message=f"Tipo incompatible con el contrato: aquí es {family} y en {contract_sheet} "
+                            f"({typed[0]['cell']}) es '{typed[0]['type']}'."
+                ))
+            if mandatory is False and all(d["mandatory"] for d in definitions):
+                issues[sheet].append(Issue(
+                    sheet=sheet, attribute=name, cell=cell, level="WARN", category="CONSISTENCY",
+                    message=f"Obligatoriedad: es obligatorio en {contract_sheet} ({definitions[0]['cell']}) "
+                            f"pero en esta hoja no está marcado como obligatorio."
+                ))
+    return issues
 
-    cols = set()
 
-    if "INSERT INTO" in clean.upper():
-        m = re.search(r"INSERT\s+INTO\s+.*?\((.*?)\)\s*VALUES", clean, re.IGNORECASE)
-        if m:
-            for c in m.group(1).split(","):
-                if c.strip(): cols.add(_loose_normalize(c.strip()))
-            return "INSERT", cols
-
-    if "UPDATE" in clean.upper() and "SET" in clean.upper():
-        matches = re.findall(r"([a-zA-Z0-9_\.]+)=[\?a-zA-Z0-9_']", clean)
-        for m in matches:
-            cols.add(_loose_normalize(m))
-        return "INSERT", cols
-
-    if "DELETE" in clean.upper() and "FROM" in clean.upper():
-        matches = re.findall(r"([a-zA-Z0-9_\.]+)=[\?a-zA-Z0-9_']", clean)
-        for m in matches:
-            cols.add(_loose_normalize(m))
-        return "INSERT", cols
-
-    if "SELECT" in clean.upper():
-        m = re.search(r"SELECT\s+(.*?)\s+FROM", clean, re.IGNORECASE)
-        if m:
-            for c in m.group(1).split(","):
-                if not c.strip(): continue
-                for part in re.split(r"\s+AS\s+|\s+", c, flags=re.IGNORECASE):
-                    if part.upper() not in ["DISTINCT", "TOP", "ALL"]:
-                        cols.add(_loose_normalize(part))
-            return "SELECT", cols
-
-    return "UNKNOWN", set()
+# =============================================================================
+# SQL
+# =============================================================================
+
+WRITE_KINDS = ("INSERT", "UPDATE", "DELETE")
+
+
+def _sql_columns(statements: list, kinds) -> set:
+    """Columnas (normalizadas) que tocan las sentencias de esos tipos: destino, alias y filtros."""
+    cols = set()
+    for st in statements:
+        if st["kind"] not in kinds: continue
+        for c in itertools.chain(st["columns"], st["aliases"], st["filters"]):
+            cols.add(_loose_normalize(c))
+    return cols
 
 
 # =============================================================================
 # VALIDACIÓN BACKEND
 # =============================================================================
 
-def validate_backend_mapping(excel_path: str) -> dict:
-    issues = []
-    xls = pd.ExcelFile(excel_path)
-    sheet_names = xls.sheet_names
-    if not sheet_names: return {"details": []}
-
+def _validate_backend_sheet(wb, sh) -> dict:
+    """
+    Checks de una hoja de backend: sintaxis de la tabla de mapeo y coherencia con su SQL.
+    Devuelve {"issues": [...], "attributes": [...]}; los atributos del lado contrato alimentan
+    el cruce con el contrato y se cachean con la hoja.
+    """
+    result = {"issues": [], "attributes": []}
+    issues, attributes = result["issues"], result["attributes"]
     try:
-        df_c = pd.read_excel(excel_path, sheet_name=sheet_names[0], header=None)
-        c_defs = _load_contract_definitions(df_c, sheet_names[0], issues)
+        rows = wb.iter_rows(sh)
+        if wb.streaming:
+            (start, a_cols, t_cols, o_cols), head = _scan_table_structure(rows)
+        else:
+            # Hoja en memoria: la cabecera sale de la rejilla normalizada
+            start, a_cols, t_cols, o_cols = _find_table_structure(wb.sheet(sh), wb.grid(sh))
+            head = []
     except:
-        c_defs = {}
+        return result
 
-    for i in range(1, len(sheet_names)):
-        sh = sheet_names[i]
-        try:
-            df = pd.read_excel(excel_path, sheet_name=sh, header=None)
-        except:
-            continue
+    if start is None: return result
+
+    in_dest, out_orig = set(), set()
+    # NUEVO: Mapas para recordar dónde está cada atributo (Nombre -> Celda)
+    in_dest_map, out_orig_map = {}, {}
+    sql_start_cell = ""  # Para marcar donde empieza el SQL
+    sql_row, sql_text = None, ""
 
-        start, a_cols, t_cols, o_cols = _find_table_structure(df)
-        if start is None: continue
+    curr_sect = "INPUT"
 
-        in_dest, out_orig = set(), set()
-        # NUEVO: Mapas para recordar dónde está cada atributo (Nombre -> Celda)
-        in_dest_map, out_orig_map = {}, {}
-        sql_start_cell = ""  # Para marcar donde empieza el SQL
+    rows = itertools.chain(head, rows)
+    for r_idx, row in enumerate(rows):
+        txt = "".join([str(x) for x in row]).lower()
 
-        curr_sect = "INPUT"
+        if "backend - output" in txt:
+            curr_sect = "OUTPUT";
+            continue
+        if "backend - input" in txt:
+            curr_sect = "INPUT";
+            continue
 
-        for r_idx in range(len(df)):
-            row = df.iloc[r_idx]
-            txt = "".join([str(x) for x in row]).lower()
+        if "insert into" in txt or "select " in txt or "update " in txt or "delete " in txt:
+            # Guardamos donde empieza el SQL por si hay errores generales
+            sql_start_cell = _get_excel_coord(r_idx, 0)
+            sql_row = (r_idx, row)
+            break
 
-            if "backend - output" in txt:
-                curr_sect = "OUTPUT";
-                continue
-            if "backend - input" in txt:
-                curr_sect = "INPUT";
-                continue
+        if r_idx <= start: continue
 
-            if "insert into" in txt or "select " in txt or "update " in txt or "delete " in txt:
-                # Guardamos donde empieza el SQL por si hay errores generales
-                sql_start_cell = _get_excel_coord(r_idx, 0)
-                break
+        try:
+            cell_val = str(row[a_cols[0]]).strip().lower()
+            if cell_val in KEYWORDS_TO_SKIP or cell_val == "nan" or cell_val == "": continue
+        except:
+            continue
 
-            if r_idx <= start: continue
+        contract_attr = _contract_side(row, curr_sect, a_cols, t_cols, o_cols)
+        if contract_attr:
+            raw, raw_t, mandatory, col = contract_attr
+            attributes.append([curr_sect, _index_key(raw), raw, _get_excel_coord(r_idx, col),
+                               _get_type_family(raw_t), mandatory])
+
+        val_to_add = None
+        val_col_idx = None
+
+        if curr_sect == "INPUT" and len(a_cols) > 1:
+            raw = str(row[a_cols[1]]).strip()
+            if raw and raw.lower() not in ["nan", "n/a", ""]:
+                norm_name = _loose_normalize(raw)
+                in_dest.add(norm_name)
+                # Guardamos la celda
+                val_col_idx = a_cols[1]
+                in_dest_map[norm_name] = _get_excel_coord(r_idx, val_col_idx)
+                val_to_add = raw
+
+        elif curr_sect == "OUTPUT" and len(a_cols) > 0:
+            raw = str(row[a_cols[0]]).strip()
+            if raw and raw.lower() not in ["nan", "n/a", ""] and not raw.isspace():
+                norm_name = _loose_normalize(raw)
+                out_orig.add(norm_name)
+                # Guardamos la celda
+                val_col_idx = a_cols[0]
+                out_orig_map[norm_name] = _get_excel_coord(r_idx, val_col_idx)
+                val_to_add = raw
+
+        if val_to_add:
+            chk_t = t_cols[0]
+            if curr_sect == "INPUT" and len(a_cols) > 1:
+                chk_t = (t_cols[1] if len(t_cols) > 1 else t_cols[0])
 
             try:
-                cell_val = str(row.iloc[a_cols[0]]).strip().lower()
-                if cell_val in KEYWORDS_TO_SKIP or cell_val == "nan" or cell_val == "": continue
+                t_val = str(row[chk_t]).strip()
+                if t_val and t_val.lower() != "nan":
+                    current_cell = _get_excel_coord(r_idx, val_col_idx)
+                    _validate_array_syntax(val_to_add, t_val, sh, issues, cell_ref=current_cell)
             except:
-                continue
+                pass
+
+    # Al parser solo llega la región SQL (desde su fila hasta el final de la hoja)
+    if sql_row is not None:
+        r_idx, row = sql_row
+        if wb.streaming:
+            sql_text = _region_text(itertools.chain([row], rows))
+        else:
+            sql_text = _extract_sql_region(wb.sheet(sh), r_idx)
+
+    statements = parse_sql(sql_text)
+    reads = _sql_columns(statements, ("SELECT",))
+    writes = _sql_columns(statements, WRITE_KINDS)
+    has_read = any(st["kind"] == "SELECT" for st in statements)
+    has_write = any(st["kind"] in WRITE_KINDS for st in statements)
+
+    # LÓGICA DE DETECCIÓN DE CELDAS PARA ERRORES SQL
+    if has_read:
+        if not out_orig:
+            issues.append(Issue(sheet=sh, attribute="Estructura Output", level="WARN",
+                                category="SQL_CONSISTENCY",
+                                cell=sql_start_cell,  # Apuntamos al SQL
+                                message="Se detectó una incongruencia: SELECT presente pero Backend-Output vacío."))
+        elif "*" not in reads and (out_orig - reads):
+            missing_set = out_orig - reads
+            # Buscamos la celda del primer atributo que falta
+            first_missing = list(missing_set)[0]
+            target_cell = out_orig_map.get(first_missing, sql_start_cell)
+
+            issues.append(Issue(sheet=sh, attribute="SQL Consistency", level="WARN",
+                                category="SQL_CONSISTENCY",
+                                cell=target_cell,
+                                message=f"Se detectó una incongruencia entre los atributos y la consulta de BD. Se sugiere renombrar el atributo. (Discrepancias: {', '.join(missing_set)})"))
+
+    if has_write:
+        # Con un SELECT en el mismo bloque, el Output se explica por la lectura
+        if out_orig and not has_read:
+            issues.append(Issue(sheet=sh, attribute="Estructura Output", level="WARN",
+                                category="SQL_CONSISTENCY",
+                                cell=sql_start_cell,
+                                message="Operación de escritura presente pero Backend-Output tiene datos."))
+
+        missing = in_dest - writes
+        if missing:
+            # Buscamos la celda del primer atributo que falta
+            first_missing = list(missing)[0]
+            target_cell = in_dest_map.get(first_missing, sql_start_cell)
+
+            issues.append(Issue(sheet=sh, attribute="SQL Consistency", level="WARN",
+                                category="SQL_CONSISTENCY",
+                                cell=target_cell,
+                                message=f"Se detectó una incongruencia entre los atributos y la consulta de BD. Se sugiere renombrar el atributo. (Discrepancias: {', '.join(missing)})"))
+
+    return result
+
+
+def validate_backend_mapping(excel_path: "str | Workbook", sheet_cache=None) -> dict:
+    issues = []
+    wb = load_workbook(excel_path)
+    sheet_names = wb.sheet_names
+    if not sheet_names: return {"details": []}
 
-            val_to_add = None
-            val_col_idx = None
+    try:
+        df_c = wb.sheet(sheet_names[0])
+        c_defs = _load_contract_definitions(df_c, sheet_names[0], issues, wb.grid(sheet_names[0]))
+    except:
+        c_defs = {}
+    events.sheet_done("backend", sheet_names[0], list(issues), True)
 
-            if curr_sect == "INPUT" and len(a_cols) > 1:
-                raw = str(row.iloc[a_cols[1]]).strip()
-                if raw and raw.lower() not in ["nan", "n/a", ""]:
-                    norm_name = _loose_normalize(raw)
-                    in_dest.add(norm_name)
-                    # Guardamos la celda
-                    val_col_idx = a_cols[1]
-                    in_dest_map[norm_name] = _get_excel_coord(r_idx, val_col_idx)
-                    val_to_add = raw
-
-            elif curr_sect == "OUTPUT" and len(a_cols) > 0:
-                raw = str(row.iloc[a_cols[0]]).strip()
-                if raw and raw.lower() not in ["nan", "n/a", ""] and not raw.isspace():
-                    norm_name = _loose_normalize(raw)
-                    out_orig.add(norm_name)
-                    # Guardamos la celda
-                    val_col_idx = a_cols[0]
-                    out_orig_map[norm_name] = _get_excel_coord(r_idx, val_col_idx)
-                    val_to_add = raw
-
-            if val_to_add:
-                chk_t = t_cols[0]
-                if curr_sect == "INPUT" and len(a_cols) > 1:
-                    chk_t = (t_cols[1] if len(t_cols) > 1 else t_cols[0])
-
-                try:
-                    t_val = str(row.iloc[chk_t]).strip()
-                    if t_val and t_val.lower() != "nan":
-                        current_cell = _get_excel_coord(r_idx, val_col_idx)
-                        _validate_array_syntax(val_to_add, t_val, sh, issues, cell_ref=current_cell)
-                except:
-                    pass
-
-        # === SOLUCIÓN ROBUSTA: Unir texto celda por celda ===
-        raw_text_parts = []
-        for r_i in range(len(df)):
-            for c_i in range(len(df.columns)):
-                val = str(df.iloc[r_i, c_i]).strip()
-                if val and val.lower() not in ['nan', 'none', 'n/a']:
-                    raw_text_parts.append(val)
-
-        full_text = " ".join(raw_text_parts)
-        sql_t, sql_c = _extract_sql_columns(full_text)
-
-        # LÓGICA DE DETECCIÓN DE CELDAS PARA ERRORES SQL
-        if sql_t == "SELECT":
-            if not out_orig:
-                issues.append({"sheet": sh, "attribute": "Estructura Output", "level": "WARN",
-                               "category": "SQL_CONSISTENCY",
-                               "cell": sql_start_cell,  # Apuntamos al SQL
-                               "message": "Se detectó una incongruencia: SELECT presente pero Backend-Output vacío."})
-            elif (out_orig - sql_c):
-                missing_set = out_orig - sql_c
-                # Buscamos la celda del primer atributo que falta
-                first_missing = list(missing_set)[0]
-                target_cell = out_orig_map.get(first_missing, sql_start_cell)
-
-                issues.append({"sheet": sh, "attribute": "SQL Consistency", "level": "WARN",
-                               "category": "SQL_CONSISTENCY",
-                               "cell": target_cell,
-                               "message": f"Se detectó una incongruencia entre los atributos y la consulta de BD. Se sugiere renombrar el atributo. (Discrepancias: {', '.join(missing_set)})"})
-
-        elif sql_t == "INSERT":
-            if out_orig:
-                issues.append({"sheet": sh, "attribute": "Estructura Output", "level": "WARN",
-                               "category": "SQL_CONSISTENCY",
-                               "cell": sql_start_cell,
-                               "message": "Operación de escritura presente pero Backend-Output tiene datos."})
-
-            missing = in_dest - sql_c
-            if missing:
-                # Buscamos la celda del primer atributo que falta
-                first_missing = list(missing)[0]
-                target_cell = in_dest_map.get(first_missing, sql_start_cell)
-
-                issues.append({"sheet": sh, "attribute": "SQL Consistency", "level": "WARN",
-                               "category": "SQL_CONSISTENCY",
-                               "cell": target_cell,
-                               "message": f"Se detectó una incongruencia entre los atributos y la consulta de BD. Se sugiere renombrar el atributo. (Discrepancias: {', '.join(missing)})"})
+    sheet_attributes = {}
+    for i in range(1, len(sheet_names)):
+        sh = sheet_names[i]
+        sheet_result, _ = cached_sheet_issues(sheet_cache, wb, sh, "backend",
+                                              lambda: (_validate_backend_sheet(wb, sh), True),
+                                              view=lambda r: r["issues"])
+        issues.extend(sheet_result["issues"])
+        sheet_attributes[sh] = sheet_result["attributes"]
+
+    # Sin contrato legible no hay contra qué cruzar: todo saldría como no definido
+    if any(c_defs.values()):
+        for sh, sheet_issues in _cross_check(c_defs, sheet_names[0], sheet_attributes).items():
+            if not sheet_issues: continue
+            issues.extend(sheet_issues)
+            events.sheet_done("crosscheck", sh, sheet_issues, True)
 
     return {"details": issues}
\ No newline at end of file
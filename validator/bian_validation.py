@@ -1,12 +1,30 @@
+import asyncio
+import itertools
 import pandas as pd
 import os
 import json
-from openai import OpenAI
 
-# Configuración Cliente OpenAI
-client = None
-if os.getenv("OPENAI_API_KEY"):
-    client = OpenAI()
+from llm import openai_client
+from validator.workbook import Workbook, load_workbook
+from validator.grid import SheetGrid, columns, first_row
+from validator.cache import sheet_key
+from validator.issue import Issue
+from validator import events, telemetry
+from validator.verdict_cache import get_verdict_cache, normalize, verdict_key
+
+# Máximo de lotes en vuelo contra OpenAI en el modo asíncrono
+LLM_CONCURRENCY = int(os.getenv("VOBO_LLM_CONCURRENCY", "8"))
+# Tamaño de lote por tokens estimados de la carga (atributo + descripción), con un tope de pares
+BATCH_TOKEN_BUDGET = int(os.getenv("VOBO_BATCH_TOKENS", "1500"))
+BATCH_MAX_ITEMS = 80
+
+SEMANTIC_MODEL = "gpt-4o-mini"
+# Súbela al cambiar el prompt: invalida los veredictos guardados
+SEMANTIC_PROMPT_VERSION = "2"
+
+
+ATTR_KW = ["atributo", "campo", "name"]
+DESC_KW = ["descripción", "descripcion", "description"]
 
 
 # =============================================================================
@@ -18,9 +36,9 @@ def _loose_normalize(text: str) -> str:
     return str(text).strip().lower().replace("_", "").replace(" ", "")
 
 
-def _is_backend_sheet(df: pd.DataFrame) -> bool:
-    """Detecta si una hoja parece ser de Backend."""
-    sample = df.head(15).to_string().lower()
+def _is_backend_sheet(head_rows) -> bool:
+    """Detecta si una hoja parece ser de Backend (a partir de sus primeras 15 filas)."""
+    sample = " ".join(str(v) for row in head_rows for v in row).lower()
     return "mapeo" in sample or "backend" in sample or "origen" in sample
 
 
@@ -34,26 +52,19 @@ def _get_excel_coord(row_idx, col_idx):
     return f"{col_str}{row_idx + 1}"
 
 
-def _extract_candidates_contract(df: pd.DataFrame) -> list:
+def _extract_candidates_contract(df: pd.DataFrame, grid: SheetGrid = None) -> list:
     candidates = []
-    attr_idx, desc_idx = None, None
-    ATTR_KW = ["atributo", "campo", "name"]
-    DESC_KW = ["descripción", "descripcion", "description"]
-
-    header_row = None
-    for i, row in df.iterrows():
-        if i > 20: break
-        r = [str(v).lower() for v in row]
-        curr_attr = next((idx for idx, v in enumerate(r) if any(k in v for k in ATTR_KW)), None)
-        curr_desc = next((idx for idx, v in enumerate(r) if any(k in v for k in DESC_KW)), None)
-
-        if curr_attr is not None and curr_desc is not None:
-            attr_idx, desc_idx = curr_attr, curr_desc
-            header_row = i
-            break
+    if grid is None: grid = SheetGrid(df)
 
+    # Cabecera: entre las primeras 21 filas, la primera con columna de atributo y de descripción
+    attr_hits = grid.contains_any(ATTR_KW)[:21]
+    desc_hits = grid.contains_any(DESC_KW)[:21]
+    header_row = first_row(attr_hits.any(axis=1) & desc_hits.any(axis=1))
     if header_row is None: return []
 
+    attr_idx = columns(attr_hits[header_row])[0]
+    desc_idx = columns(desc_hits[header_row])[0]
+
     for i in range(header_row + 1, len(df)):
         row = df.iloc[i]
         try:
@@ -75,46 +86,54 @@ def _extract_candidates_contract(df: pd.DataFrame) -> list:
     return candidates
 
 
-def _extract_candidates_backend(df: pd.DataFrame) -> list:
-    candidates = []
-    desc_idx = None
-    DESC_KW = ["descripción", "descripcion", "description"]
-    header_row = None
+def _find_backend_header(grid: SheetGrid):
+    """(fila, col. atributo, col. descripción) de la tabla de backend, vía máscaras sobre la rejilla."""
+    desc_hits = grid.contains_any(DESC_KW)
+    header_row = first_row(desc_hits.any(axis=1) & grid.contains("atributo").any(axis=1))
+    if header_row is None: return None, None, None
 
-    for i, row in df.iterrows():
+    desc_idx = columns(desc_hits[header_row])[0]
+    # Columna de atributo más cercana a la izquierda de la descripción
+    left = [c for c in columns(grid.contains_any(ATTR_KW)[header_row]) if c < desc_idx]
+    return header_row, (left[-1] if left else None), desc_idx
+
+
+def _scan_backend_header(rows):
+    """Igual que _find_backend_header pero fila a fila (modo streaming)."""
+    for i, row in enumerate(rows):
         r = [str(v).lower() for v in row]
         found_desc = next((idx for idx, v in enumerate(r) if any(k in v for k in DESC_KW)), None)
         if found_desc is not None:
             if any("atributo" in x for x in r):
-                desc_idx = found_desc
-                header_row = i
-                break
+                left = [idx for idx, v in enumerate(r) if idx < found_desc and any(k in v for k in ATTR_KW)]
+                return i, (left[-1] if left else None), found_desc
 
-    if header_row is None: return []
+    return None, None, None
 
-    attr_idx = None
-    row_headers = df.iloc[header_row]
-    best_dist = 999
-    for idx, val in enumerate(row_headers):
-        val_str = str(val).lower()
-        if "atributo" in val_str or "campo" in val_str or "name" in val_str:
-            if idx < desc_idx:
-                dist = desc_idx - idx
-                if dist < best_dist:
-                    best_dist = dist
-                    attr_idx = idx
 
+def _extract_candidates_backend(rows, grid: SheetGrid = None) -> list:
+    """Recibe un iterador de filas: se deja de leer la hoja en cuanto aparece el 'insert into'."""
+    candidates = []
+
+    rows = iter(rows)
+    if grid is not None:
+        header_row, attr_idx, desc_idx = _find_backend_header(grid)
+        if header_row is not None:
+            for _ in itertools.islice(rows, header_row + 1): pass
+    else:
+        header_row, attr_idx, desc_idx = _scan_backend_header(rows)
+
+    if header_row is None: return []
     if attr_idx is None: return []
 
     seen = set()
-    for i in range(header_row + 1, len(df)):
-        row = df.iloc[i]
+    for i, row in enumerate(rows, start=header_row + 1):
         row_str = "".join([str(x) for x in row]).lower()
         if "backend - input" in row_str or "backend - output" in row_str: continue
 
         try:
-            raw_attr = str(row.iloc[attr_idx]).strip()
-            raw_desc = str(row.iloc[desc_idx]).strip()
+            raw_attr = str(row[attr_idx]).strip()
+            raw_desc = str(row[desc_idx]).strip()
         except:
             continue
 
@@ -138,9 +157,7 @@ def _extract_candidates_backend(df: pd.DataFrame) -> list:
 # LÓGICA IA (PROMPT: SILENCIO SI ES CORRECTO)
 # =============================================================================
 
-def _consult_semantic_expert(candidates: list, context_type: str) -> list:
-    if not candidates: return []
-
+def _semantic_messages(candidates: list) -> list:
     # Prompt ajustado para eliminar "falsos positivos" o "comentarios educativos"
     system_prompt = (
         "Eres un Auditor de Coherencia de Datos estricto. Tu trabajo es detectar SOLO ERRORES GRAVES de dominio.\n"
@@ -151,85 +168,322 @@ def _consult_semantic_expert(candidates: list, context_type: str) -> list:
         "JSON output: { \"issues\": [] } (Devuelve lista vacía si todo parece razonable)."
     )
 
-    clean_candidates = [{"attribute": c["attribute"], "description": c["description"]} for c in candidates]
+    # Carga compacta: pares [atributo, descripción] sin claves repetidas ni espacios
+    pairs = [[c["attribute"], c["description"]] for c in candidates]
 
     user_content = (
-        f"Analiza estos pares Atributo-Descripción:\n{json.dumps(clean_candidates, ensure_ascii=False)}\n\n"
+        f"Analiza estos pares [atributo, descripción]:\n{json.dumps(pairs, ensure_ascii=False, separators=(',', ':'))}\n\n"
         "JSON output: { \"issues\": [ { \"attribute\": \"...\", \"reason\": \"Explica el error\" } ] }"
     )
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}],
-            temperature=0, response_format={"type": "json_object"}
-        )
-        result = json.loads(response.choices[0].message.content)
-        return result.get("issues", [])
-    except Exception as e:
-        return []
+
+def _consult_semantic_expert(candidates: list) -> list | None:
+    """Devuelve los hallazgos del lote, o None si la llamada falló (el resultado no debe cachearse)."""
+    if not candidates: return []
+
+    with telemetry.span("llm", "semantic_bian", model=SEMANTIC_MODEL, batch_size=len(candidates)) as sp:
+        try:
+            response, retries = openai_client.chat_completion(
+                openai_client.get_client(),
+                model=SEMANTIC_MODEL,
+                messages=_semantic_messages(candidates),
+                temperature=0, response_format={"type": "json_object"}
+            )
+            telemetry.record_llm(sp, response, retries)
+            result = json.loads(response.choices[0].message.content)
+            return result.get("issues", [])
+        except Exception as e:
+            sp["ok"] = False
+            return None
+
+
+async def _consult_semantic_expert_async(candidates: list, semaphore, aclient) -> list | None:
+    """Versión asíncrona de _consult_semantic_expert; el semáforo acota las llamadas en vuelo."""
+    if not candidates: return []
+
+    async with semaphore:
+        # Mientras esperaba turno el veredicto pudo quedar decidido (veredicto rápido)
+        if events.cancelled(): return None
+        # El span empieza al obtener el semáforo: mide la llamada, no la espera en cola
+        with telemetry.span("llm", "semantic_bian", model=SEMANTIC_MODEL, batch_size=len(candidates)) as sp:
+            try:
+                response, retries = await openai_client.chat_completion_async(
+                    aclient,
+                    model=SEMANTIC_MODEL,
+                    messages=_semantic_messages(candidates),
+                    temperature=0, response_format={"type": "json_object"}
+                )
+                telemetry.record_llm(sp, response, retries)
+                result = json.loads(response.choices[0].message.content)
+                return result.get("issues", [])
+            except Exception as e:
+                sp["ok"] = False
+                return None
 
 
 # =============================================================================
-# FUNCIÓN PRINCIPAL
+# LOTES POR PRESUPUESTO DE TOKENS
 # =============================================================================
 
-def validate_bian_alignment(excel_path: str) -> dict:
-    if not client: return {"details": []}
-    issues = []
+def _estimate_tokens(candidate: dict) -> int:
+    # ~4 caracteres por token, más el marco del par (["","" ],)
+    return (len(candidate["attribute"]) + len(candidate["description"])) // 4 + 4
+
+
+def _batches(candidates: list) -> list:
+    """
+    Lotes de hasta BATCH_TOKEN_BUDGET tokens estimados (y BATCH_MAX_ITEMS pares): las descripciones
+    largas van en lotes cortos y las cortas se agrupan. Un atributo (normalizado) no se repite dentro
+    de un lote porque la respuesta se asocia por nombre; el par repetido pasa al lote siguiente.
+    """
+    batches, pending = [], list(candidates)
+    while pending:
+        batch, names, tokens, rest = [], set(), 0, []
+        for i, c in enumerate(pending):
+            cost = _estimate_tokens(c)
+            if batch and (tokens + cost > BATCH_TOKEN_BUDGET or len(batch) >= BATCH_MAX_ITEMS):
+                rest.extend(pending[i:])
+                break
+            name = normalize(c["attribute"])
+            if name in names:
+                rest.append(c)
+                continue
+            batch.append(c)
+            names.add(name)
+            tokens += cost
+        batches.append(batch)
+        pending = rest
+    return batches
 
-    try:
-        xls = pd.ExcelFile(excel_path)
-        sheet_names = xls.sheet_names
-    except:
-        return {"details": []}
 
-    for idx, sheet in enumerate(sheet_names):
+# =============================================================================
+# REPARTO DE VEREDICTOS (pares únicos de todo el libro)
+# =============================================================================
+
+class _PairDispatch:
+    """
+    Cada par atributo/descripción distinto del libro se consulta una sola vez, aunque se repita
+    en varias hojas, y su veredicto vuelve a cada hoja y celda donde aparece. Los veredictos ya
+    guardados no se consultan. Cada hoja se cierra (caché por hoja y evento) en cuanto están
+    resueltos todos sus pares.
+    """
+
+    def __init__(self, pending: list, per_sheet: list, sheet_cache):
+        self.pending = {idx: (sheet, key, candidates, keys) for idx, sheet, key, candidates, keys in pending}
+        self.per_sheet = per_sheet
+        self.sheet_cache = sheet_cache
+        self.store = get_verdict_cache()
+        self.failed = set()
+        self.extra = {}  # idx -> hallazgos con atributo que no reconocemos (sin cachear)
+
+        unique = {}
+        self.waiting = {}  # clave -> hojas que esperan ese veredicto
+        for idx, (_, _, candidates, keys) in self.pending.items():
+            for c, k in zip(candidates, keys):
+                unique.setdefault(k, c)
+                self.waiting.setdefault(k, set()).add(idx)
+
+        self.verdicts = {}
+        if self.store is not None:
+            try:
+                self.verdicts = self.store.get_many(list(unique))
+            except Exception as e:
+                # Almacén bloqueado o corrupto: se consulta todo al LLM, la caché nunca tumba el VoBo
+                pass
+        self.remaining = {idx: len(set(keys) - self.verdicts.keys()) for idx, (_, _, _, keys) in self.pending.items()}
+        self.misses = [{**c, "key": k} for k, c in unique.items() if k not in self.verdicts]
+
+        for idx in [i for i, n in self.remaining.items() if n == 0]:
+            self._finish(idx)
+
+    def resolve(self, batch: list, suggestions: list | None):
+        """Registra la respuesta de un lote (None = falló o se abandonó) y cierra las hojas que quedan completas."""
         try:
-            df = pd.read_excel(excel_path, sheet_name=sheet, header=None)
-            candidates = []
-            context = ""
-
-            if idx == 0:
-                candidates = _extract_candidates_contract(df)
-                context = "CONTRACT"
-            else:
-                if _is_backend_sheet(df):
-                    candidates = _extract_candidates_backend(df)
-                    context = "BACKEND"
+            self._record(batch, suggestions)
+        except Exception as e:
+            # Respuesta malformada: el lote cuenta como fallido, el VoBo sigue
+            self.failed.update(c["key"] for c in batch)
+
+        done = []
+        for c in batch:
+            for idx in self.waiting[c["key"]]:
+                self.remaining[idx] -= 1
+                if self.remaining[idx] == 0: done.append(idx)
+        for idx in sorted(done):
+            self._finish(idx)
+
+    def _record(self, batch: list, suggestions):
+        if not isinstance(suggestions, list):
+            self.failed.update(c["key"] for c in batch)
+        else:
+            # Misma normalización que la clave del veredicto: "CITY" en la respuesta es el "city" enviado
+            by_attr, extra = {}, []
+            names = {normalize(c["attribute"]) for c in batch}
+            for s in suggestions:
+                if not isinstance(s, dict): continue
+                name = normalize(s.get("attribute"))
+                if name in names:
+                    by_attr.setdefault(name, []).append(str(s.get("reason") or ""))
                 else:
-                    continue
+                    extra.append(s)
+            fresh = {c["key"]: by_attr.get(normalize(c["attribute"]), []) for c in batch}
+            unsure = set()
+            if extra:
+                # Se reportan en la primera hoja que aportó pares al lote. No sabemos a qué par
+                # corresponden: los [] del lote no se guardan como "correcto" y sus hojas quedan
+                # incompletas (sin caché por hoja ni de resultado), así se vuelven a consultar
+                owner = min(idx for c in batch for idx in self.waiting[c["key"]])
+                self.extra.setdefault(owner, []).extend(extra)
+                unsure = {k for k, v in fresh.items() if not v}
+                self.failed.update(unsure)
+            self.verdicts.update(fresh)
+            if self.store is not None:
+                try:
+                    self.store.put_many({k: v for k, v in fresh.items() if k not in unsure})
+                except Exception as e:
+                    # Sin guardar el veredicto solo se pierde la caché: el lote sigue siendo válido
+                    pass
+
+    def _finish(self, idx: int):
+        sheet, key, candidates, keys = self.pending[idx]
+        complete = not self.failed.intersection(keys)
+        suggestions = [
+            {"attribute": c["attribute"], "reason": reason, "cell": c["cell"]}
+            for c, k in zip(candidates, keys) for reason in self.verdicts.get(k, [])
+        ]
+        try:
+            sheet_issues = _sheet_issues(sheet, suggestions + self.extra.get(idx, []))
+        except Exception as e:
+            sheet_issues, complete = [], False
+        if key and complete:
+            self.sheet_cache.put(key, sheet_issues)
+        self.per_sheet[idx] = (sheet_issues, complete)
+        events.sheet_done("bian", sheet, sheet_issues, complete, "miss" if key else "off")
+
+
+# =============================================================================
+# FUNCIÓN PRINCIPAL
+# =============================================================================
+
+def _sheet_candidates(wb, idx: int, sheet) -> tuple[list, str]:
+    """Candidatos Atributo-Descripción de una hoja y su contexto (CONTRACT/BACKEND)."""
+    if idx == 0:
+        return _extract_candidates_contract(wb.sheet(sheet), wb.grid(sheet)), "CONTRACT"
+
+    rows = wb.iter_rows(sheet)
+    head = list(itertools.islice(rows, 15))
+    if _is_backend_sheet(head):
+        grid = None if wb.streaming else wb.grid(sheet)
+        return _extract_candidates_backend(itertools.chain(head, rows), grid), "BACKEND"
+    return [], ""
+
+
+def _plan_sheets(wb, sheet_names, sheet_cache) -> tuple[list, list]:
+    """
+    Las hojas en la caché quedan resueltas; del resto se extraen los candidatos con su clave de
+    veredicto. Devuelve (resultado por hoja, pendientes [(idx, hoja, clave de caché, candidatos, claves)]).
+    """
+    llm_mode = openai_client.llm_mode()
+    per_sheet = [None] * len(sheet_names)
+    pending = []
+    for idx, sheet in enumerate(sheet_names):
+        with telemetry.span("sheet", sheet, stage="bian") as sp:
+            key = sheet_key(sheet_cache, wb, sheet, "bian", "contract" if idx == 0 else "backend", f"llm={llm_mode}")
+            hit = sheet_cache.get(key) if key else None
+            sp["cache"] = "hit" if hit is not None else ("miss" if key else "off")
+            if hit is not None:
+                per_sheet[idx] = (hit, True)
+                events.sheet_done("bian", sheet, hit, True, "hit")
+                continue
+
+            try:
+                candidates, context = _sheet_candidates(wb, idx, sheet)
+            except Exception as e:
+                per_sheet[idx] = ([], False)
+                events.sheet_done("bian", sheet, [], False)
+                continue
+
+        keys = [verdict_key(c["attribute"], c["description"], context, SEMANTIC_MODEL, SEMANTIC_PROMPT_VERSION)
+                for c in candidates]
+        pending.append((idx, sheet, key, candidates, keys))
+    return per_sheet, pending
+
+
+def _sheet_issues(sheet, suggestions: list) -> list:
+    """Convierte las respuestas del LLM en hallazgos con su hoja y celda."""
+    issues = []
+    for s in suggestions:
+        if not isinstance(s, dict): continue
+        reason = str(s.get('reason') or '')
+        # FILTRO PYTHON: Doble seguridad
+        # Si la IA dice "es correcto", "es adecuado", "parece bien", lo borramos.
+        msg_lower = reason.lower()
+        if "correcto" in msg_lower or "adecuado" in msg_lower or "válido" in msg_lower:
+            continue
 
-            if not candidates: continue
+        issues.append(Issue(
+            sheet=sheet,
+            attribute=str(s.get("attribute") or "Desconocido"),
+            cell=s.get("cell", ""),
+            level="WARN",
+            category="SEMANTIC_BIAN",
+            message=f"🧠 Semántica: {reason}"
+        ))
+    return issues
 
-            attr_cell_map = {c["attribute"]: c["cell"] for c in candidates}
 
-            batch_size = 40
-            for i in range(0, len(candidates), batch_size):
-                batch = candidates[i:i + batch_size]
-                suggestions = _consult_semantic_expert(batch, context)
+def _dispatch_sync(dispatch: _PairDispatch):
+    for batch in _batches(dispatch.misses):
+        # Veredicto rápido: el rechazo ya es seguro, los lotes pendientes no se envían
+        suggestions = None if events.cancelled() else _consult_semantic_expert(batch)
+        dispatch.resolve(batch, suggestions)
 
-                for s in suggestions:
-                    reason = s.get('reason', '')
-                    # FILTRO PYTHON: Doble seguridad
-                    # Si la IA dice "es correcto", "es adecuado", "parece bien", lo borramos.
-                    msg_lower = reason.lower()
-                    if "correcto" in msg_lower or "adecuado" in msg_lower or "válido" in msg_lower:
-                        continue
 
-                    attr_name = s.get("attribute", "Desconocido")
-                    cell_loc = attr_cell_map.get(attr_name, "")
+async def _dispatch_async(dispatch: _PairDispatch, concurrency: int, aclient):
+    """Todos los lotes a la vez (máx. `concurrency` en vuelo); cada hoja se cierra al resolverse sus pares."""
+    semaphore = asyncio.Semaphore(concurrency)
 
-                    issues.append({
-                        "sheet": sheet,
-                        "attribute": attr_name,
-                        "cell": cell_loc,
-                        "level": "WARN",
-                        "category": "SEMANTIC_BIAN",
-                        "message": f"🧠 Semántica: {reason}"
-                    })
+    async def run(batch):
+        dispatch.resolve(batch, await _consult_semantic_expert_async(batch, semaphore, aclient))
 
-        except Exception as e:
-            continue
+    try:
+        await asyncio.gather(*[run(b) for b in _batches(dispatch.misses)])
+    finally:
+        await aclient.close()
+
+
+def validate_bian_alignment(excel_path: "str | Workbook", sheet_cache=None, concurrency: int | None = None) -> dict:
+    """
+    concurrency: lotes simultáneos contra el LLM (por defecto VOBO_LLM_CONCURRENCY).
+    Con 1, o sin cliente asíncrono, los lotes se consultan uno a uno.
+    """
+    if not openai_client.get_client(): return {"details": []}
+    issues = []
+    complete = True
+
+    try:
+        wb = load_workbook(excel_path)
+        sheet_names = wb.sheet_names
+    except:
+        return {"details": []}
 
-    return {"details": issues}
\ No newline at end of file
+    if concurrency is None:
+        concurrency = LLM_CONCURRENCY
+
+    per_sheet, pending = _plan_sheets(wb, sheet_names, sheet_cache)
+    dispatch = _PairDispatch(pending, per_sheet, sheet_cache)
+    aclient = openai_client.new_async_client() if concurrency > 1 and dispatch.misses else None
+    if aclient:
+        asyncio.run(_dispatch_async(dispatch, concurrency, aclient))
+    else:
+        _dispatch_sync(dispatch)
+
+    for sheet_issues, sheet_complete in per_sheet:
+        issues.extend(sheet_issues)
+        complete = complete and sheet_complete
+
+    result = {"details": issues}
+    if not complete:
+        result["incomplete"] = True
+    return result
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Mapping
+
+from validator import events, telemetry
+
+# Versión de las reglas de validación: súbela cuando cambie cualquier check
+# para que los resultados cacheados con reglas antiguas dejen de usarse.
+RULES_VERSION = "6"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vobo")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+# =============================================================================
+# CLAVES
+# =============================================================================
+
+def source_digest(excel_path) -> str:
+    """SHA-256 del contenido del libro (ruta, bytes o Workbook ya cargado)."""
+    source = getattr(excel_path, "source", excel_path)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    h = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def result_key(digest: str, *parts) -> str:
+    """Combina el hash del libro con la versión de reglas y cualquier opción que altere el resultado."""
+    raw = "|".join([digest, RULES_VERSION] + [str(p) for p in parts])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _json_default(obj):
+    # Los hallazgos (validator.issue.Issue) se guardan como su vista dict
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"{type(obj).__name__} no es serializable a JSON")
+
+
+# =============================================================================
+# CACHÉ EN DISCO (LRU POR TAMAÑO)
+# =============================================================================
+
+class ResultCache:
+    """
+    Caché en disco direccionada por contenido: un JSON por clave.
+    La recencia se guarda en el mtime de cada archivo; al superar max_bytes se
+    eliminan primero los menos usados.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # Marca como usado recientemente
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False, default=_json_default)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"): continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, name in entries:
+            if total <= self.max_bytes: break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError:
+                pass
+
+
+# =============================================================================
+# REVALIDACIÓN INCREMENTAL POR HOJA
+# =============================================================================
+
+def sheet_key(cache, wb, sheet, stage: str, *parts):
+    """Clave de caché de una etapa de una hoja, o None si no hay caché o la hoja es ilegible."""
+    if cache is None:
+        return None
+    try:
+        return result_key(wb.fingerprint(sheet), "sheet", sheet, stage, *parts)
+    except Exception:
+        # Hoja ilegible: que la maneje el propio validador
+        return None
+
+
+def cached_sheet_issues(cache, wb, sheet, stage: str, compute, *parts, view=None):
+    """
+    Reutiliza los hallazgos de una hoja si su contenido no cambió desde la última revisión.
+    compute() devuelve (issues, completo); los resultados incompletos (p.ej. fallo del LLM)
+    no se guardan. Los checks que dependen del contrato deben pasar su huella en *parts.
+    Al terminar emite el evento "sheet" con los hallazgos (ver validator.events).
+    Si compute() guarda algo más que la lista (p.ej. hallazgos + atributos de la hoja),
+    view(valor) devuelve los hallazgos para el evento.
+    """
+    with telemetry.span("sheet", sheet, stage=stage) as sp:
+        issues, complete = _cached_sheet_issues(cache, wb, sheet, stage, compute, parts, sp)
+    events.sheet_done(stage, sheet, view(issues) if view else issues, complete, sp.get("cache", ""))
+    return issues, complete
+
+
+def _cached_sheet_issues(cache, wb, sheet, stage: str, compute, parts, sp: dict):
+    key = sheet_key(cache, wb, sheet, stage, *parts)
+    if key is None:
+        sp["cache"] = "off"
+        return compute()
+
+    hit = cache.get(key)
+    sp["cache"] = "hit" if hit is not None else "miss"
+    if hit is not None:
+        return hit, True
+
+    issues, complete = compute()
+    if complete:
+        cache.put(key, issues)
+    return issues, complete
+
+
+_default_cache = None
+
+
+def get_result_cache():
+    """Caché por defecto del proceso (VOBO_CACHE_DIR / VOBO_CACHE_MAX_MB). VOBO_CACHE=0 la desactiva."""
+    global _default_cache
+    if os.getenv("VOBO_CACHE", "1") == "0":
+        return None
+    if _default_cache is None:
+        try:
+            _default_cache = ResultCache(
+                os.getenv("VOBO_CACHE_DIR", DEFAULT_CACHE_DIR),
+                int(float(os.getenv("VOBO_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+            )
+        except OSError:
+            return None
+    return _default_cache
@@ -0,0 +1,126 @@
+"""
+VoBo por lotes: valida directorios completos de matrices en paralelo.
+
+Emite una línea JSON por libro en cuanto termina (veredicto, hallazgos y tiempos) y
+sale con código 1 si alguna matriz no aprueba el VoBo o no se pudo validar, y con 2 si
+alguna ruta no existe o no hay matrices que validar.
+
+Uso:
+    python -m validator.cli matrices/ --workers 8 --recursive > resultados.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+def _find_workbooks(paths: list, recursive: bool) -> tuple[list, list]:
+    """Devuelve (libros encontrados, rutas que no existen)."""
+    found, missing = [], []
+    for path in paths:
+        if not os.path.exists(path):
+            missing.append(path)
+            continue
+        if os.path.isfile(path):
+            found.append(path)
+            continue
+        if recursive:
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files)
+        else:
+            found.extend(os.path.join(path, f) for f in os.listdir(path))
+    # "~$archivo.xlsx" son los bloqueos temporales de Excel
+    return sorted(f for f in found
+                  if f.lower().endswith(EXCEL_EXTENSIONS) and not os.path.basename(f).startswith("~$")), missing
+
+
+def _error_line(path: str, e: BaseException) -> dict:
+    return {"file": path, "vobo": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def _validate_one(path: str, streaming: bool, use_cache: bool, concurrent: bool, metrics: bool = False,
+                  fast: bool = False) -> dict:
+    """Se ejecuta en un proceso del pool: nunca lanza, los fallos van en la línea JSON."""
+    from validator.vobo import run_vobo
+
+    start = time.perf_counter()
+    try:
+        result = run_vobo(path, streaming=streaming, use_cache=use_cache, concurrent=concurrent, metrics=metrics,
+                          fast=fast)
+    except Exception as e:
+        return {**_error_line(path, e), "timings": {"total_ms": round((time.perf_counter() - start) * 1000, 1)}}
+
+    line = {
+        "file": path,
+        "vobo": result.get("vobo"),
+        "message": result.get("message"),
+        "issues": [dict(i) for i in result.get("details", [])],
+        "timings": {"total_ms": round((time.perf_counter() - start) * 1000, 1)},
+    }
+    if result.get("incomplete"):
+        line["incomplete"] = True
+    if result.get("skipped"):
+        line["skipped"] = result["skipped"]
+    if "metrics" in result:
+        line["timings"]["breakdown"] = result["metrics"]["summary"]
+    return line
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m validator.cli",
+                                     description="Ejecuta el VoBo sobre directorios de matrices de transformación.")
+    parser.add_argument("paths", nargs="+", help="Archivos .xlsx o directorios")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Procesos en paralelo")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Recorre subdirectorios")
+    parser.add_argument("-o", "--output", help="Archivo JSONL de salida (por defecto stdout)")
+    parser.add_argument("--streaming", action="store_true", help="Lee las hojas de backend fila a fila")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora la caché de resultados")
+    parser.add_argument("--sequential-validators", action="store_true",
+                        help="No paraleliza los validadores dentro de cada libro")
+    parser.add_argument("--fast", action="store_true",
+                        help="Veredicto rápido: omite los checks con LLM si el rechazo ya es seguro")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Añade el desglose de tiempos (validadores, hojas, LLM) y guarda la traza")
+    args = parser.parse_args(argv)
+
+    workbooks, missing = _find_workbooks(args.paths, args.recursive)
+    if missing:
+        for path in missing:
+            print(f"No existe: {path}", file=sys.stderr)
+        return 2
+    if not workbooks:
+        print("No se encontraron archivos .xlsx", file=sys.stderr)
+        return 2
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {pool.submit(_validate_one, path, args.streaming, not args.no_cache,
+                                   not args.sequential_validators, args.metrics, args.fast): path
+                       for path in workbooks}
+            # Se escribe cada línea en cuanto termina su libro, sin esperar al resto
+            for future in as_completed(futures):
+                try:
+                    line = future.result()
+                except Exception as e:
+                    # El proceso del libro murió (p.ej. BrokenProcessPool): su línea lleva el error
+                    line = _error_line(futures[future], e)
+                if line.get("vobo") is not True:
+                    failed += 1
+                out.write(json.dumps(line, ensure_ascii=False) + "\n")
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"{len(workbooks)} matrices validadas, {failed} sin VoBo", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
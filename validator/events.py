@@ -0,0 +1,58 @@
+import contextvars
+from contextlib import contextmanager
+
+_current_sink = contextvars.ContextVar("vobo_events", default=None)
+_current_cancel = contextvars.ContextVar("vobo_cancel", default=None)
+
+
+# =============================================================================
+# EVENTOS DE PROGRESO
+# =============================================================================
+# Los validadores avisan de cada hoja terminada con emit(); quien ejecuta el VoBo decide qué
+# hacer con los eventos (vobo.iter_vobo los pasa a un generador). Sin receptor, emit() no hace nada.
+# Como la traza de telemetry, el receptor viaja en el contexto: los hilos lo heredan con telemetry.bind.
+
+@contextmanager
+def collecting(sink):
+    """
+    sink(evento) recibe cada evento emitido dentro del bloque (puede llamarse desde varios hilos).
+    Los receptores se anidan: el de fuera sigue recibiendo los eventos.
+    """
+    parent = _current_sink.get()
+    if parent is not None:
+        inner = sink
+
+        def sink(event):
+            inner(event)
+            parent(event)
+    token = _current_sink.set(sink)
+    try:
+        yield
+    finally:
+        _current_sink.reset(token)
+
+
+def emit(kind: str, **data) -> None:
+    sink = _current_sink.get()
+    if sink is not None:
+        sink({"type": kind, **data})
+
+
+@contextmanager
+def cancel_scope(flag):
+    """flag (threading.Event) marcado = los checks caros pendientes dentro del bloque deben abandonarse."""
+    token = _current_cancel.set(flag)
+    try:
+        yield
+    finally:
+        _current_cancel.reset(token)
+
+
+def cancelled() -> bool:
+    flag = _current_cancel.get()
+    return flag is not None and flag.is_set()
+
+
+def sheet_done(stage: str, sheet, issues: list, complete: bool, cache: str = "") -> None:
+    """Hallazgos de una hoja para una etapa (statuscode, backend, bian) en cuanto están listos."""
+    emit("sheet", stage=stage, sheet=sheet, issues=issues, complete=complete, cache=cache)
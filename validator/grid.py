@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# REJILLA NORMALIZADA (detección de cabeceras vectorizada)
+# =============================================================================
+
+class SheetGrid:
+    """
+    Hoja normalizada una sola vez: cada celda como texto en minúsculas y sin espacios
+    laterales ("" si está vacía). Las búsquedas de palabras clave se resuelven como
+    máscaras booleanas (filas x columnas) y se memorizan, de modo que todos los
+    detectores de cabecera que miran la misma hoja comparten el trabajo.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.shape = df.shape
+        flat = pd.Series(df.to_numpy(dtype=object).ravel(), dtype=object)
+        flat = flat.where(flat.notna(), "").astype(str).str.strip().str.lower()
+        self._flat = flat
+        self.values = flat.to_numpy(dtype=object).reshape(self.shape)
+        self._masks = {}
+
+    def contains(self, keyword: str) -> np.ndarray:
+        """Celdas que contienen la palabra clave (subcadena)."""
+        if keyword not in self._masks:
+            hits = self._flat.str.contains(keyword, regex=False).to_numpy(dtype=bool)
+            self._masks[keyword] = hits.reshape(self.shape)
+        return self._masks[keyword]
+
+    def contains_any(self, keywords) -> np.ndarray:
+        masks = [self.contains(k) for k in keywords]
+        return np.logical_or.reduce(masks) if masks else np.zeros(self.shape, dtype=bool)
+
+    def head_in(self, keywords, sep: str) -> np.ndarray:
+        """Celdas cuyo texto antes de sep está entre las palabras clave ("varchar(20)" -> "varchar")."""
+        heads = self._flat.str.split(sep, n=1).str[0].str.strip()
+        return heads.isin(list(keywords)).to_numpy(dtype=bool).reshape(self.shape)
+
+    def equals_any(self, keywords) -> np.ndarray:
+        """Celdas cuyo texto normalizado es exactamente una de las palabras clave."""
+        return np.isin(self.values, list(keywords))
+
+
+def first_row(row_hits: np.ndarray):
+    """Índice de la primera fila marcada, o None."""
+    idx = np.flatnonzero(row_hits)
+    return int(idx[0]) if idx.size else None
+
+
+def columns(row_mask: np.ndarray) -> list:
+    return [int(c) for c in np.flatnonzero(row_mask)]
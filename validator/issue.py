@@ -0,0 +1,79 @@
+import sys
+from collections.abc import Mapping
+
+# Campos conocidos de un hallazgo; cualquier otro va a `extra`
+FIELDS = ("sheet", "attribute", "cell", "level", "category", "message", "blocks_vobo")
+# Valores que se repiten miles de veces en matrices grandes: se internan para compartir el str
+_INTERNED = ("sheet", "level", "category")
+
+
+# =============================================================================
+# HALLAZGO
+# =============================================================================
+
+class Issue(Mapping):
+    """
+    Hallazgo de validación compacto (__slots__, sin __dict__ por instancia).
+    Se comporta como el dict de siempre (get, [], dict(issue), json vía dict) y solo contiene
+    las claves que se pasaron: un campo en None es un campo ausente.
+    Precalcula la clave de dedupe y si bloquea el VoBo, para no recalcularlas en cada pasada.
+    """
+    __slots__ = FIELDS + ("extra", "key", "blocking")
+
+    def __init__(self, sheet=None, attribute=None, cell=None, level=None, category=None, message=None,
+                 blocks_vobo=None, **extra):
+        for name, value in (("sheet", sheet), ("level", level), ("category", category)):
+            if isinstance(value, str):
+                value = sys.intern(value)
+            setattr(self, name, value)
+        self.attribute = attribute
+        self.cell = cell
+        self.message = message
+        self.blocks_vobo = blocks_vobo
+        self.extra = extra or None
+        self.key = (
+            _key_part(sheet), _key_part(attribute), _key_part(category), _key_part(level), _key_part(message)
+        )
+        self.blocking = blocks_vobo is True or level == "ERROR"
+
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "Issue":
+        return cls(**data)
+
+    def __getitem__(self, name):
+        if name in FIELDS:
+            value = getattr(self, name)
+            if value is None: raise KeyError(name)
+            return value
+        if self.extra and name in self.extra:
+            return self.extra[name]
+        raise KeyError(name)
+
+    def __iter__(self):
+        for name in FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Issue({dict(self)!r})"
+
+    def __reduce__(self):
+        return (_rebuild, (dict(self),))
+
+
+def _rebuild(data: dict) -> Issue:
+    return Issue(**data)
+
+
+def _key_part(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def as_issue(item) -> Issue:
+    """Issue tal cual, o construido desde un dict (p.ej. hallazgos leídos de la caché en disco)."""
+    return item if isinstance(item, Issue) else Issue.from_mapping(item)
@@ -0,0 +1,354 @@
+"""
+Parser SQL mínimo para los bloques pegados en las hojas de backend.
+
+No pretende validar SQL: extrae, en una sola pasada y sin expresiones regulares con
+retroceso, lo que los checks de mapeo necesitan de cada sentencia (tipo, tabla,
+columnas, alias y columnas filtradas en el WHERE).
+"""
+import re
+
+# Un único patrón de alternativas disjuntas recorrido con finditer: cada carácter se
+# consume una vez (el espacio previo va dentro de cada token). Los literales y comentarios sin cerrar llegan hasta el final del
+# texto en lugar de provocar reintentos. Los corchetes solo citan nombres si cierran en la
+# misma línea sin comas ni paréntesis: "campo[]" (array en la matriz) no abre una cita.
+_TOKEN = re.compile(r"""\s*(?:
+      (?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<string>'[^']*(?:''[^']*)*'?)
+    | (?P<quoted>"[^"]*"?|`[^`]*`?|\[[^\],()\n]*\])
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<param>\?|[:@$]\w+)
+    | (?P<word>[^\W\d]\w*|\#\w+)
+    | (?P<op><>|!=|<=|>=|\|\||::|[=<>+\-*/%])
+    | (?P<punct>[(),.;])
+    | (?P<other>.)
+    | (?P<space>\Z)
+)""", re.VERBOSE | re.DOTALL)
+
+STATEMENT_KEYWORDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+SET_OPERATORS = {"UNION", "INTERSECT", "EXCEPT", "MINUS"}
+# Una palabra de sentencia tras estas no abre sentencia nueva (UNION ALL SELECT, FOR UPDATE...)
+CONTINUATION_WORDS = SET_OPERATORS | {"ALL", "DISTINCT", "KEY", "FOR", "ON"}
+COMPARISON_OPS = {"=", "<>", "!=", "<", ">", "<=", ">=", "LIKE", "IN", "IS", "BETWEEN"}
+
+RESERVED = {
+    "SELECT", "FROM", "WHERE", "AS", "AND", "OR", "NOT", "NULL", "IS", "IN", "LIKE", "BETWEEN",
+    "CASE", "WHEN", "THEN", "ELSE", "END", "DISTINCT", "ALL", "TOP", "ON", "JOIN", "INNER",
+    "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "GROUP", "BY", "ORDER", "HAVING", "LIMIT",
+    "OFFSET", "UNION", "INTERSECT", "EXCEPT", "MINUS", "INSERT", "INTO", "VALUES", "UPDATE",
+    "SET", "DELETE", "WITH", "RECURSIVE", "EXISTS", "ASC", "DESC", "RETURNING", "TRUE", "FALSE",
+}
+
+
+# =============================================================================
+# TOKENIZADOR
+# =============================================================================
+
+def tokenize(sql_text: str) -> list:
+    """Tokens (tipo, texto, texto en mayúsculas si es palabra) sin espacios ni comentarios."""
+    tokens = []
+    for m in _TOKEN.finditer(sql_text):
+        kind = m.lastgroup
+        if kind == "space" or kind == "comment": continue
+        text = m.group(kind)
+        tokens.append((kind, text, text.upper() if kind == "word" else text))
+    return tokens
+
+
+def _split_statements(tokens: list) -> list:
+    """
+    Parte el script en sentencias: por ';' o por una palabra de sentencia a profundidad 0
+    que no continúe la actual (INSERT ... SELECT, WITH ... SELECT, UNION SELECT).
+    """
+    statements, current = [], []
+    depth = 0
+    pending = False  # WITH / INSERT que aún esperan su cuerpo
+    for tok in tokens:
+        kind, text, up = tok
+        if depth == 0:
+            if text == ";":
+                statements.append(current)
+                current, pending = [], False
+                continue
+            if kind == "word" and up in STATEMENT_KEYWORDS:
+                prev = current[-1][2] if current else None
+                if current and (pending or prev in CONTINUATION_WORDS):
+                    if up != "WITH": pending = up == "INSERT"
+                else:
+                    statements.append(current)
+                    current, pending = [], up in ("WITH", "INSERT")
+            elif kind == "word" and up == "VALUES":
+                pending = False
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth = max(depth - 1, 0)
+        current.append(tok)
+    statements.append(current)
+    # Lo que precede a la primera sentencia (etiquetas de la hoja) se descarta
+    return [s for s in statements if s and s[0][2] in STATEMENT_KEYWORDS]
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def _match_parens(toks: list) -> dict:
+    """Índice del ')' que cierra cada '(' (o el último token si no se cierra)."""
+    match, stack = {}, []
+    for i, tok in enumerate(toks):
+        if tok[1] == "(":
+            stack.append(i)
+        elif tok[1] == ")" and stack:
+            match[stack.pop()] = i
+    for i in stack:
+        match[i] = len(toks) - 1
+    return match
+
+
+def _scan_to(toks: list, i: int, stops: set, match: dict) -> int:
+    """Avanza hasta una de las palabras de parada a profundidad 0 (saltando paréntesis)."""
+    while i < len(toks) and toks[i][2] not in stops:
+        i = match.get(i, i) + 1
+    return i
+
+
+def _split_top(toks: list, start: int, end: int, match: dict) -> list:
+    """Rangos (inicio, fin) separados por comas a profundidad 0."""
+    ranges, i, s = [], start, start
+    while i < end:
+        if toks[i][1] == ",":
+            ranges.append((s, i))
+            s = i + 1
+        i = match.get(i, i) + 1
+    ranges.append((s, min(i, end)))
+    return [(a, b) for a, b in ranges if a < b]
+
+
+def _is_name(tok) -> bool:
+    return tok[0] == "quoted" or (tok[0] == "word" and tok[2] not in RESERVED)
+
+
+def _unquote(text: str) -> str:
+    if text[:1] in ('"', "`", "["):
+        return text[1:-1] if len(text) > 1 and text[-1] in ('"', "`", "]") else text[1:]
+    return text
+
+
+def _read_name(toks: list, i: int):
+    """Nombre con puntos (esquema.tabla, t.col, t.*) desde i: (nombre, siguiente índice)."""
+    if i >= len(toks): return None, i
+    if toks[i][1] == "*": return "*", i + 1
+    if not _is_name(toks[i]): return None, i
+    parts = [_unquote(toks[i][1])]
+    i += 1
+    # Tras un punto vale cualquier palabra (t.date, t.user...)
+    while i + 1 < len(toks) and toks[i][1] == "." and toks[i + 1][0] in ("word", "quoted", "op"):
+        if toks[i + 1][0] == "op" and toks[i + 1][1] != "*": break
+        parts.append(_unquote(toks[i + 1][1]))
+        i += 2
+    name = ".".join(parts)
+    if i < len(toks) and toks[i][1] == "[]":  # sufijo de array de la matriz
+        name, i = name + "[]", i + 1
+    return name, i
+
+
+def _expr_refs(toks: list, start: int, end: int, match: dict) -> list:
+    """Columnas referenciadas en una expresión (sin nombres de función ni subconsultas)."""
+    refs, i = [], start
+    while i < end:
+        tok = toks[i]
+        if tok[1] == "(" and i + 1 < end and toks[i + 1][2] == "SELECT":
+            i = match.get(i, end) + 1
+            continue
+        if tok[2] == "AS":  # CAST(x AS INT): el tipo no es una columna
+            i += 2
+            continue
+        if _is_name(tok):
+            name, j = _read_name(toks, i)
+            if j >= end or toks[j][1] != "(":
+                refs.append(name)
+            i = j
+            continue
+        i += 1
+    return refs
+
+
+def _render(toks: list) -> str:
+    out = ""
+    for _, text, _ in toks:
+        if out and text not in ("(", ")", ".", ",") and not out.endswith(("(", ".")): out += " "
+        out += text
+    return out
+
+
+def _new_statement(kind: str) -> dict:
+    return {"kind": kind, "table": None, "columns": [], "aliases": {}, "filters": [], "ctes": []}
+
+
+# =============================================================================
+# SENTENCIAS
+# =============================================================================
+
+def _select_item(toks: list, s: int, e: int, match: dict, stmt: dict) -> str:
+    """Registra columnas y alias del elemento y devuelve su nombre de salida."""
+    alias, expr_end = None, e
+    if e - s >= 2 and _is_name(toks[e - 1]):
+        prev = toks[e - 2]
+        if prev[2] == "AS":
+            alias, expr_end = toks[e - 1][1], e - 2
+        elif prev[0] in ("quoted", "string", "number") or prev[1] == ")" \
+                or (prev[0] == "word" and (prev[2] not in RESERVED or prev[2] == "END")):
+            alias, expr_end = toks[e - 1][1], e - 1
+
+    name, j = _read_name(toks, s)
+    if name and j == expr_end:
+        stmt["columns"].append(name)
+        source = name
+    else:
+        stmt["columns"].extend(_expr_refs(toks, s, expr_end, match))
+        source = _render(toks[s:expr_end])
+    if alias:
+        stmt["aliases"][_unquote(alias)] = source
+        return _unquote(alias)
+    return source.split(".")[-1]
+
+
+def _read_table(toks: list, i: int, match: dict):
+    if i < len(toks) and toks[i][1] == "(":  # FROM (subconsulta)
+        return None, match.get(i, i) + 1
+    return _read_name(toks, i)
+
+
+def _parse_select(toks: list, i: int, match: dict, stmt: dict, outputs: list = None) -> int:
+    n = len(toks)
+    while i < n:
+        while i < n and toks[i][2] in ("DISTINCT", "ALL"): i += 1
+        if i < n and toks[i][2] == "TOP":
+            i += 1
+            if i < n: i = match.get(i, i) + 1
+
+        end = _scan_to(toks, i, {"FROM", "INTO"} | SET_OPERATORS, match)
+        for s, e in _split_top(toks, i, end, match):
+            name = _select_item(toks, s, e, match, stmt)
+            if outputs is not None: outputs.append(name)
+        outputs = None  # los nombres de salida son los de la primera rama
+        i = end
+
+        if i < n and toks[i][2] == "INTO":  # SELECT ... INTO destino
+            _, i = _read_name(toks, i + 1)
+        if i < n and toks[i][2] == "FROM":
+            table, i = _read_table(toks, i + 1, match)
+            if stmt["table"] is None: stmt["table"] = table
+
+        i = _scan_to(toks, i, SET_OPERATORS, match)
+        if i >= n: break
+        i += 1
+        while i < n and toks[i][2] in ("ALL", "DISTINCT"): i += 1
+        if i < n and toks[i][2] == "SELECT":
+            i += 1
+        else:
+            break
+    return i
+
+
+def _parse_where(toks: list, i: int, match: dict, stmt: dict):
+    """Columnas comparadas en el WHERE (lado izquierdo de la comparación)."""
+    i = _scan_to(toks, i, {"WHERE"}, match) + 1
+    end = len(toks)
+    while i < end:
+        tok = toks[i]
+        if tok[1] == "(" and i + 1 < end and toks[i + 1][2] == "SELECT":
+            i = match.get(i, end) + 1
+            continue
+        if _is_name(tok):
+            name, j = _read_name(toks, i)
+            if j < end and toks[j][2] in COMPARISON_OPS:
+                stmt["filters"].append(name)
+            i = j
+            continue
+        i += 1
+
+
+def _parse_insert(toks: list, i: int, match: dict, stmt: dict):
+    n = len(toks)
+    while i < n and toks[i][2] in ("INTO", "IGNORE", "OR", "REPLACE"): i += 1
+    stmt["table"], i = _read_name(toks, i)
+
+    if i < n and toks[i][1] == "(" and not (i + 1 < n and toks[i + 1][2] == "SELECT"):
+        close = match.get(i, n - 1)
+        for s, e in _split_top(toks, i + 1, close, match):
+            name, _ = _read_name(toks, s)
+            if name: stmt["columns"].append(name)
+        i = close + 1
+
+    i = _scan_to(toks, i, {"VALUES", "SELECT"}, match)
+    if i < n and toks[i][2] == "SELECT":
+        source, outputs = _new_statement("SELECT"), []
+        _parse_select(toks, i + 1, match, source, outputs)
+        stmt["aliases"] = source["aliases"]
+        if not stmt["columns"]:
+            # Sin lista de columnas: las del SELECT de origen (alias si lo tienen)
+            stmt["columns"] = outputs
+
+
+def _parse_update(toks: list, i: int, match: dict, stmt: dict):
+    stmt["table"], i = _read_table(toks, i, match)
+    i = _scan_to(toks, i, {"SET"}, match) + 1
+    end = _scan_to(toks, i, {"WHERE", "FROM", "RETURNING"}, match)
+    for s, e in _split_top(toks, i, end, match):
+        name, j = _read_name(toks, s)
+        if name and j < e and toks[j][1] == "=":
+            stmt["columns"].append(name)
+    _parse_where(toks, end, match, stmt)
+
+
+def _parse_delete(toks: list, i: int, match: dict, stmt: dict):
+    if i < len(toks) and toks[i][2] == "FROM": i += 1
+    stmt["table"], i = _read_table(toks, i, match)
+    _parse_where(toks, i, match, stmt)
+
+
+def _skip_ctes(toks: list, i: int, match: dict, ctes: list) -> int:
+    n = len(toks)
+    if i < n and toks[i][2] == "RECURSIVE": i += 1
+    while i < n:
+        name, i = _read_name(toks, i)
+        if name: ctes.append(name)
+        if i < n and toks[i][1] == "(": i = match.get(i, i) + 1  # columnas del CTE
+        if i < n and toks[i][2] == "AS": i += 1
+        if i < n and toks[i][1] == "(": i = match.get(i, i) + 1  # cuerpo
+        if i < n and toks[i][1] == ",":
+            i += 1
+            continue
+        break
+    return i
+
+
+_PARSERS = {"SELECT": _parse_select, "INSERT": _parse_insert, "UPDATE": _parse_update, "DELETE": _parse_delete}
+
+
+def _parse_statement(toks: list):
+    match = _match_parens(toks)
+    ctes = []
+    i = _skip_ctes(toks, 1, match, ctes) if toks[0][2] == "WITH" else 0
+    if i >= len(toks) or toks[i][2] not in _PARSERS: return None
+
+    stmt = _new_statement(toks[i][2])
+    stmt["ctes"] = ctes
+    _PARSERS[stmt["kind"]](toks, i + 1, match, stmt)
+    stmt["columns"] = list(dict.fromkeys(c for c in stmt["columns"] if c))
+    stmt["filters"] = list(dict.fromkeys(stmt["filters"]))
+    return stmt
+
+
+def parse_sql(sql_text: str) -> list:
+    """
+    Una sentencia estructurada por bloque SQL del texto, en orden:
+    {"kind", "table", "columns", "aliases", "filters", "ctes"}.
+    kind es SELECT, INSERT, UPDATE o DELETE; los nombres se devuelven tal cual (sin comillas).
+    """
+    statements = []
+    for toks in _split_statements(tokenize(sql_text)):
+        stmt = _parse_statement(toks)
+        if stmt: statements.append(stmt)
+    return statements
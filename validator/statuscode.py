@@ -1,18 +1,32 @@
+import numpy as np
 import pandas as pd
-import re
-import os
 import json
-from openai import OpenAI
 
-client = None
-if os.getenv("OPENAI_API_KEY"):
-    client = OpenAI()
+from llm import openai_client
+from validator.workbook import Workbook, load_workbook
+from validator.grid import SheetGrid, columns, first_row
+from validator.cache import cached_sheet_issues
+from validator.issue import Issue
+from validator import events, telemetry
+from validator.verdict_cache import get_verdict_cache, normalize, verdict_key
+
+COHERENCE_MODEL = "gpt-4o-mini"
+# Súbela al cambiar el prompt: invalida los veredictos guardados
+COHERENCE_PROMPT_VERSION = "1"
 
 TYPE_KEYWORDS = {
     "string", "varchar", "char", "text", "number", "decimal", "int", "integer",
     "date", "datetime", "boolean", "bool", "object", "array"
 }
 
+STATUS_CODE_RE = r"status\s*code\s*[:=]?\s*(\d+)"
+MANDATORY_VALUES = ["yes", "no", "si"]
+IO_KEYWORDS = ["entrada", "salida", "output", "input"]
+# Cabeceras de los bloques de detalle (columna de cada rol)
+HEADER_IO = ["entrada", "salida", "e/s", "i/o", "input", "output"]
+HEADER_MANDATORY = ["oblig", "mandator", "requerid", "required"]
+HEADER_TYPE = ["tipo", "type"]
+
 
 # =============================================================================
 # HELPERS
@@ -42,12 +56,6 @@ def _is_output(val: str) -> bool:
     return "salida" in v or "output" in v or "response" in v or "respuesta" in v
 
 
-def _looks_like_type(val: str) -> bool:
-    v = _normalize(str(val))
-    v = v.split("(")[0].strip()
-    return v in TYPE_KEYWORDS
-
-
 def _validate_array_syntax(attr_name, dtype, sheet_name, issues_list, cell_ref=""):
     name = str(attr_name).strip()
     dt = str(dtype).strip().lower()
@@ -58,44 +66,37 @@ def _validate_array_syntax(attr_name, dtype, sheet_name, issues_list, cell_ref="
     is_array = "array" in dt
 
     if has_brackets_at_end and not is_array:
-        issues_list.append({
-            "sheet": sheet_name, "attribute": name, "level": "WARN", "category": "SYNTAX",
-            "cell": cell_ref,
+        issues_list.append(Issue(
+            sheet=sheet_name, attribute=name, level="WARN", category="SYNTAX",
+            cell=cell_ref,
             # TEXTO UNIFICADO
-            "message": f"Sintaxis: El nombre termina en '[]' pero el tipo es '{dtype}'. Debería ser 'Array'."
-        })
+            message=f"Sintaxis: El nombre termina en '[]' pero el tipo es '{dtype}'. Debería ser 'Array'."
+        ))
     elif is_array and not has_brackets_at_end:
-        issues_list.append({
-            "sheet": sheet_name, "attribute": name, "level": "WARN", "category": "SYNTAX",
-            "cell": cell_ref,
+        issues_list.append(Issue(
+            sheet=sheet_name, attribute=name, level="WARN", category="SYNTAX",
+            cell=cell_ref,
             # TEXTO UNIFICADO
-            "message": f"Sintaxis: El tipo es 'Array' pero no termina en '[]'."
-        })
+            message=f"Sintaxis: El tipo es 'Array' pero no termina en '[]'."
+        ))
 
 
-def _extract_summary_table(df: pd.DataFrame):
-    summary = []
-    start_row = None
+def _last(cols: list):
+    return cols[-1] if cols else None
 
-    for i, row in df.iterrows():
-        row_str = [str(v).lower() for v in row]
-        if any("http status code" in s for s in row_str):
-            start_row = i
-            break
 
-    if start_row is None: return []
+def _extract_summary_table(df: pd.DataFrame, grid: SheetGrid = None):
+    summary = []
+    if grid is None: grid = SheetGrid(df)
 
-    headers = df.iloc[start_row]
-    idx_code, idx_alias, idx_desc = None, None, None
+    start_row = first_row(grid.contains("http status code").any(axis=1))
+    if start_row is None: return []
 
-    for c, val in enumerate(headers):
-        v = str(val).lower()
-        if "code" in v:
-            idx_code = c
-        elif "alias" in v:
-            idx_alias = c
-        elif "descri" in v:
-            idx_desc = c
+    # Columnas de la cabecera (si una celda encaja en varias, manda code > alias > descri)
+    code_hits = grid.contains("code")[start_row]
+    alias_hits = grid.contains("alias")[start_row] & ~code_hits
+    desc_hits = grid.contains("descri")[start_row] & ~code_hits & ~alias_hits
+    idx_code, idx_alias, idx_desc = _last(columns(code_hits)), _last(columns(alias_hits)), _last(columns(desc_hits))
 
     if idx_code is None: return []
 
@@ -121,68 +122,74 @@ def _extract_summary_table(df: pd.DataFrame):
     return summary
 
 
-def _parse_detailed_blocks(df: pd.DataFrame):
-    blocks = {}
-    current_code = None
-    regex_header = re.compile(r"status\s*code\s*[:=]?\s*(\d+)", re.IGNORECASE)
-
-    for i, row in df.iterrows():
-        row_text = " ".join([str(x) for x in row if pd.notna(x)])
+def _role_column(header_hits, value_hits):
+    """Columna de un rol en el bloque: la de su cabecera o, sin cabecera, la que más valores encaja."""
+    if header_hits is not None and header_hits.any():
+        return int(np.flatnonzero(header_hits)[0])
+    counts = value_hits.sum(axis=0)
+    return int(counts.argmax()) if counts.size and counts.max() > 0 else None
 
-        match = regex_header.search(row_text)
-        if match:
-            current_code = int(match.group(1))
-            blocks[current_code] = []
-            continue
 
-        if current_code is not None:
-            if "atributo" in row_text.lower() and "tipo" in row_text.lower(): continue
-
-            clean_cells = []
-            attr_found = False
-            attr_val = ""
-            attr_col = -1
-
-            for col_idx, val in enumerate(row):
-                s = str(val).strip()
-                if s and s.lower() != 'nan':
-                    clean_cells.append(s)
-                    if not attr_found:
-                        attr_val = s
-                        attr_col = col_idx
-                        attr_found = True
-
-            if not clean_cells: continue
-
-            raw_attr = attr_val
-            raw_io, raw_mand, raw_type = "", "", ""
-
-            for cell in clean_cells[1:]:
-                c_low = cell.lower()
-                if c_low in ["yes", "no", "si"] and not raw_mand:
-                    raw_mand = cell
-                    continue
-                if any(x in c_low for x in ["entrada", "salida", "output", "input"]) and not raw_io:
-                    raw_io = cell
-                    continue
-                if _looks_like_type(c_low) and not raw_type:
-                    raw_type = cell
-                    continue
-
-            if raw_attr and (raw_type or raw_mand):
-                blocks[current_code].append({
-                    "attribute": raw_attr,
-                    "io": raw_io,
-                    "mandatory": raw_mand,
-                    "type": raw_type,
-                    "cell": _get_excel_coord(i, attr_col)
-                })
+def _parse_detailed_blocks(df: pd.DataFrame, grid: SheetGrid = None):
+    blocks = {}
+    if grid is None: grid = SheetGrid(df)
+    if not len(df): return blocks
+
+    # Límites de bloque: una sola regex sobre el texto de las filas que mencionan "status"
+    candidates = np.flatnonzero(grid.contains("status").any(axis=1))
+    row_text = pd.Series(grid.values[candidates].tolist(), index=candidates, dtype=object).str.join(" ")
+    codes = row_text.str.extract(STATUS_CODE_RE, expand=False).dropna()
+    if codes.empty: return blocks
+
+    values = grid.values
+    original = df.to_numpy(dtype=object)
+    filled = (values != "") & (values != "nan")
+    attr_col = filled.argmax(axis=1)  # el atributo es la primera celda con texto de la fila
+    is_header = grid.contains("atributo").any(axis=1) & grid.contains("tipo").any(axis=1)
+
+    io_hdr = grid.contains_any(HEADER_IO)
+    roles = {
+        "io": (io_hdr, grid.contains_any(IO_KEYWORDS)),
+        "mandatory": (grid.contains_any(HEADER_MANDATORY), grid.equals_any(MANDATORY_VALUES)),
+        "type": (grid.contains_any(HEADER_TYPE) & ~io_hdr, grid.head_in(TYPE_KEYWORDS, "(")),
+    }
+
+    starts = codes.index.to_numpy()
+    ends = np.append(starts[1:], len(df))
+    for code, start, end in zip(codes, starts, ends):
+        rows = np.arange(start + 1, end)
+        header = first_row(is_header[rows])
+        header = None if header is None else rows[header]
+
+        # Columnas resueltas una vez por bloque; el valor cuenta si además tiene la forma esperada
+        found = {}
+        for role, (hdr_hits, val_hits) in roles.items():
+            col = _role_column(None if header is None else hdr_hits[header], val_hits[rows])
+            hits = np.zeros(len(rows), dtype=bool) if col is None else val_hits[rows, col] & (attr_col[rows] != col)
+            found[role] = (col, hits)
+
+        keep = filled[rows].any(axis=1) & ~is_header[rows] & (found["type"][1] | found["mandatory"][1])
+
+        def cell_text(role, i, k):
+            col, hits = found[role]
+            return str(original[i, col]).strip() if hits[k] else ""
+
+        attrs = []
+        for k in np.flatnonzero(keep):
+            i, c = int(rows[k]), int(attr_col[rows[k]])
+            attrs.append({
+                "attribute": str(original[i, c]).strip(),
+                "io": cell_text("io", i, k),
+                "mandatory": cell_text("mandatory", i, k),
+                "type": cell_text("type", i, k),
+                "cell": _get_excel_coord(i, c)
+            })
+        blocks[int(code)] = attrs
 
     return blocks
 
 
-def _check_coherence_with_llm(summary_list):
-    if not client: return []
+def _ask_coherence_llm(summary_list):
     clean_list = [{"code": x["code"], "alias": x["alias"], "desc": x["description"]} for x in summary_list]
 
     # CAMBIO IMPORTANTE: Prompt ajustado para eliminar ruido
@@ -194,41 +201,105 @@ def _check_coherence_with_llm(summary_list):
         "Devuelve JSON: { \"issues\": [ { \"code\": 0, \"message\": \"Explica la contradicción\" } ] } "
         "Si todo está bien, devuelve issues vacío."
     )
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": json.dumps(clean_list)}],
-            temperature=0, response_format={"type": "json_object"}
-        )
-        data = json.loads(response.choices[0].message.content)
-        return data.get("issues", [])
-    except:
-        return []
+    with telemetry.span("llm", "coherence", model=COHERENCE_MODEL, batch_size=len(clean_list)) as sp:
+        try:
+            response, retries = openai_client.chat_completion(
+                openai_client.get_client(),
+                model=COHERENCE_MODEL,
+                messages=[{"role": "system", "content": prompt}, {"role": "user", "content": json.dumps(clean_list)}],
+                temperature=0, response_format={"type": "json_object"}
+            )
+            telemetry.record_llm(sp, response, retries)
+            data = json.loads(response.choices[0].message.content)
+            return data.get("issues", [])
+        except:
+            sp["ok"] = False
+            return None
 
 
-def validate_error_definitions(excel_path: str) -> dict:
-    issues = []
+def _check_coherence_with_llm(summary_list):
+    """
+    Devuelve las contradicciones detectadas, o None si la llamada al LLM falló.
+    Los veredictos se guardan por (código, alias, descripción): solo se consulta lo nunca visto.
+    Si el almacén falla (SQLite bloqueado o corrupto) se consulta todo y no se guarda nada.
+    """
+    if not openai_client.get_client(): return []
+    # Veredicto rápido: el rechazo ya es seguro y el LLM no lo cambiaría
+    if events.cancelled(): return None
+    store = get_verdict_cache()
+    if store is None: return _ask_coherence_llm(summary_list)
+
+    keys = [verdict_key(x["code"], x["alias"], x["description"], COHERENCE_MODEL, COHERENCE_PROMPT_VERSION)
+            for x in summary_list]
     try:
-        xls = pd.ExcelFile(excel_path)
-        sheet_name = xls.sheet_names[0]
-        df = pd.read_excel(excel_path, sheet_name=sheet_name, header=None)
-    except:
-        return {"details": []}
+        known = store.get_many(keys)
+    except Exception:
+        known = {}
+    misses = [(x, k) for x, k in zip(summary_list, keys) if k not in known]
+
+    fresh = {}
+    extra = []
+    if misses:
+        found = _ask_coherence_llm([x for x, _ in misses])
+        if found is None: return None
+
+        # Misma normalización que la clave: un "500" (str) en la respuesta es el 500 enviado
+        miss_codes = {normalize(x["code"]) for x, _ in misses}
+        by_code = {}
+        for i in found:
+            if not isinstance(i, dict): continue
+            code = normalize(i.get("code"))
+            if code in miss_codes:
+                by_code.setdefault(code, []).append(i.get("message"))
+            else:
+                extra.append(i)
+        fresh = {k: by_code.get(normalize(x["code"]), []) for x, k in misses}
+        # Con hallazgos sin asociar no sabemos a qué código corresponden: los [] de ese lote
+        # no se guardan como "correcto" (se volverán a consultar)
+        try:
+            store.put_many({k: v for k, v in fresh.items() if v or not extra})
+        except Exception:
+            pass
 
-    summary_codes = _extract_summary_table(df)
-    llm_issues = _check_coherence_with_llm(summary_codes)
-    for i in llm_issues:
-        issues.append({
-            "sheet": sheet_name, "attribute": f"StatusCode {i.get('code')}", "level": "WARN", "category": "SEMANTIC",
-            "message": f"🤖 IA Semántica: {i.get('message')}"
-        })
+    verdicts = {**known, **fresh}
+    issues = []
+    emitted = set()
+    for x, k in zip(summary_list, keys):
+        if k in emitted: continue
+        emitted.add(k)
+        issues.extend({"code": x["code"], "message": m} for m in verdicts[k])
+    return issues + extra
+
+
+def _validate_contract_sheet(df: pd.DataFrame, sheet_name, grid: SheetGrid = None, llm: bool = True) -> tuple[list, bool]:
+    """
+    Checks de códigos de estado sobre la hoja de contrato. Devuelve (issues, completo).
+    Los checks estructurales (los bloqueantes) no esperan al LLM: se emiten antes como evento "partial".
+    """
+    summary_codes = _extract_summary_table(df, grid)
+    structural = _structural_issues(df, sheet_name, grid, summary_codes)
+    events.emit("partial", stage="statuscode", sheet=sheet_name, issues=structural)
 
-    defined_blocks = _parse_detailed_blocks(df)
+    issues = []
+    llm_issues = _check_coherence_with_llm(summary_codes) if llm else []
+    complete = llm_issues is not None
+    for i in llm_issues or []:
+        issues.append(Issue(
+            sheet=sheet_name, attribute=f"StatusCode {i.get('code')}", level="WARN", category="SEMANTIC",
+            message=f"🤖 IA Semántica: {i.get('message')}"
+        ))
+    return issues + structural, complete
+
+
+def _structural_issues(df: pd.DataFrame, sheet_name, grid: SheetGrid, summary_codes: list) -> list:
+    """Bloques de detalle frente a la tabla resumen: faltantes, 200/204 y estructura de los errores."""
+    issues = []
+    defined_blocks = _parse_detailed_blocks(df, grid)
 
     success_codes = [c for c in defined_blocks.keys() if 200 <= c < 300]
     if not success_codes:
-        issues.append({"sheet": sheet_name, "attribute": "StatusCode 2xx", "level": "WARN",
-                       "message": "No se detectó ningún bloque de respuesta exitosa (200/204)."})
+        issues.append(Issue(sheet=sheet_name, attribute="StatusCode 2xx", level="WARN",
+                            message="No se detectó ningún bloque de respuesta exitosa (200/204)."))
 
     all_codes_to_check = list(summary_codes)
     for c in success_codes:
@@ -241,20 +312,20 @@ def validate_error_definitions(excel_path: str) -> dict:
         if code not in defined_blocks:
             if 400 <= code < 600:
                 issues.append(
-                    {"sheet": sheet_name, "attribute": f"StatusCode {code}", "level": "ERROR", "blocks_vobo": True,
-                     "message": "Falta definición detallada del error."})
+                    Issue(sheet=sheet_name, attribute=f"StatusCode {code}", level="ERROR", blocks_vobo=True,
+                          message="Falta definición detallada del error."))
             continue
 
         attrs = defined_blocks[code]
 
         if code == 204 and len(attrs) > 0:
             issues.append(
-                {"sheet": sheet_name, "attribute": f"StatusCode {code}", "level": "ERROR", "blocks_vobo": True,
-                 "category": "STATUSCODE", "message": "204 No Content debe estar vacío."})
+                Issue(sheet=sheet_name, attribute=f"StatusCode {code}", level="ERROR", blocks_vobo=True,
+                      category="STATUSCODE", message="204 No Content debe estar vacío."))
         elif code == 200 and len(attrs) == 0:
             issues.append(
-                {"sheet": sheet_name, "attribute": f"StatusCode {code}", "level": "ERROR", "blocks_vobo": True,
-                 "category": "STATUSCODE", "message": "200 OK debe tener atributos."})
+                Issue(sheet=sheet_name, attribute=f"StatusCode {code}", level="ERROR", blocks_vobo=True,
+                      category="STATUSCODE", message="200 OK debe tener atributos."))
 
         found_names = set()
         for attr in attrs:
@@ -266,27 +337,51 @@ def validate_error_definitions(excel_path: str) -> dict:
                 if name in ["code", "message", "description"]:
                     if attr['type'] and "string" not in _normalize(attr['type']):
                         issues.append(
-                            {"sheet": sheet_name, "attribute": f"Error {code}.{attr['attribute']}", "level": "ERROR",
-                             "cell": attr.get('cell', ''),
-                             "message": f"Debe ser String (se detectó '{attr['type']}')."})
+                            Issue(sheet=sheet_name, attribute=f"Error {code}.{attr['attribute']}", level="ERROR",
+                                  cell=attr.get('cell', ''),
+                                  message=f"Debe ser String (se detectó '{attr['type']}')."))
                     if attr['mandatory'] and not _is_mandatory(attr['mandatory']):
                         issues.append(
-                            {"sheet": sheet_name, "attribute": f"Error {code}.{attr['attribute']}", "level": "ERROR",
-                             "cell": attr.get('cell', ''),
-                             "message": "Debe ser Obligatorio."})
+                            Issue(sheet=sheet_name, attribute=f"Error {code}.{attr['attribute']}", level="ERROR",
+                                  cell=attr.get('cell', ''),
+                                  message="Debe ser Obligatorio."))
                     if attr['io'] and not _is_output(attr['io']):
                         issues.append(
-                            {"sheet": sheet_name, "attribute": f"Error {code}.{attr['attribute']}", "level": "ERROR",
-                             "cell": attr.get('cell', ''),
-                             "message": "Debe ser de Salida."})
+                            Issue(sheet=sheet_name, attribute=f"Error {code}.{attr['attribute']}", level="ERROR",
+                                  cell=attr.get('cell', ''),
+                                  message="Debe ser de Salida."))
 
         if 400 <= code < 600:
             required = {"code", "message", "description"}
             missing = required - found_names
             if missing:
-                issues.append({
-                    "sheet": sheet_name, "attribute": f"StatusCode {code}", "level": "ERROR", "blocks_vobo": True,
-                    "message": f"Estructura de error incompleta. Faltan: {', '.join(missing)}."
-                })
+                issues.append(Issue(
+                    sheet=sheet_name, attribute=f"StatusCode {code}", level="ERROR", blocks_vobo=True,
+                    message=f"Estructura de error incompleta. Faltan: {', '.join(missing)}."
+                ))
+
+    return issues
+
+
+def validate_error_definitions(excel_path: "str | Workbook", sheet_cache=None, llm: bool = True) -> dict:
+    """llm=False omite el check de coherencia con el LLM (solo los checks deterministas)."""
+    try:
+        wb = load_workbook(excel_path)
+        sheet_name = wb.sheet_names[0]
+        df = wb.sheet(sheet_name)
+    except:
+        return {"details": []}
+
+    # Depende solo de la hoja de contrato: se invalida cuando cambia la hoja 0
+    issues, complete = cached_sheet_issues(sheet_cache, wb, sheet_name, "statuscode",
+                                           lambda: _validate_contract_sheet(df, sheet_name, wb.grid(sheet_name), llm),
+                                           f"llm={openai_client.llm_mode() if llm else 'off'}")
+    result = {"details": issues}
+    if not complete:
+        result["incomplete"] = True
+    return result
+
 
-    return {"details": issues}
\ No newline at end of file
+def validate_error_structure(excel_path: "str | Workbook", sheet_cache=None) -> dict:
+    """Checks de códigos de estado sin LLM: la parte barata que el modo de veredicto rápido ejecuta primero."""
+    return validate_error_definitions(excel_path, sheet_cache, llm=False)
\ No newline at end of file
@@ -0,0 +1,169 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_NAME = "traces.jsonl"
+# Al superar este tamaño el archivo rota a traces.jsonl.1 (se conserva una sola generación)
+DEFAULT_TRACE_MAX_BYTES = 16 * 1024 * 1024
+
+_current_trace = contextvars.ContextVar("vobo_trace", default=None)
+_current_span = contextvars.ContextVar("vobo_span", default=None)
+
+
+# =============================================================================
+# TRAZA DE UNA EJECUCIÓN
+# =============================================================================
+
+class Trace:
+    """
+    Spans de una ejecución de run_vobo (validadores, hojas, parseo, llamadas al LLM).
+    Los hilos y las tareas asyncio añaden spans a la misma traza: la lista va con lock.
+    """
+
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.spans = []
+        self._lock = threading.Lock()
+        self._ids = 0
+        self._t0 = time.perf_counter()
+
+    def _new_id(self) -> int:
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def _add(self, data: dict):
+        with self._lock:
+            self.spans.append(data)
+
+    def elapsed_ms(self, t: float = None) -> float:
+        return round(((t if t is not None else time.perf_counter()) - self._t0) * 1000, 2)
+
+    def metrics(self) -> dict:
+        spans = sorted(self.spans, key=lambda s: (s["start_ms"], s["id"]))
+        return {**self.attrs, "total_ms": self.elapsed_ms(), "summary": _summarize(spans), "spans": spans}
+
+
+def _summarize(spans: list) -> dict:
+    llm = {"calls": 0, "errors": 0, "ms": 0.0, "items": 0, "tokens_in": 0, "tokens_out": 0, "retries": 0}
+    validators, sheets, parse_ms = {}, [], 0.0
+    for s in spans:
+        kind = s["kind"]
+        if kind == "validator":
+            validators[s["name"]] = s["duration_ms"]
+        elif kind == "sheet":
+            sheets.append({"sheet": s["name"], "stage": s.get("stage", ""), "ms": s["duration_ms"],
+                           "cache": s.get("cache", "")})
+        elif kind == "parse":
+            parse_ms += s["duration_ms"]
+        elif kind == "llm":
+            llm["calls"] += 1
+            llm["errors"] += 0 if s.get("ok", True) else 1
+            llm["ms"] += s["duration_ms"]
+            llm["items"] += s.get("batch_size") or 0
+            llm["tokens_in"] += s.get("tokens_in") or 0
+            llm["tokens_out"] += s.get("tokens_out") or 0
+            llm["retries"] += s.get("retries") or 0
+    llm["ms"] = round(llm["ms"], 2)
+    sheets.sort(key=lambda x: x["ms"], reverse=True)
+    return {"parse_ms": round(parse_ms, 2), "validators": validators, "sheets": sheets, "llm": llm}
+
+
+# =============================================================================
+# API DE INSTRUMENTACIÓN
+# =============================================================================
+
+@contextmanager
+def tracing(enabled: bool = True, **attrs):
+    """Activa una traza para todo lo que se ejecute dentro (None si no está habilitada)."""
+    if not enabled:
+        yield None
+        return
+    trace = Trace(**attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(kind: str, name: str, **attrs):
+    """
+    Mide el bloque como un span de la traza activa. Devuelve el dict del span para que el
+    código instrumentado añada atributos (tokens, tamaño del lote...). Sin traza es un no-op.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield {}
+        return
+
+    parent = _current_span.get()
+    data = {"id": trace._new_id(), "parent": parent["id"] if parent else None, "kind": kind, "name": name, **attrs}
+    token = _current_span.set(data)
+    start = time.perf_counter()
+    try:
+        yield data
+    except BaseException as e:
+        data["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        data["start_ms"] = trace.elapsed_ms(start)
+        data["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        trace._add(data)
+
+
+def record_llm(data: dict, response, retries: int = 0):
+    """Tokens de entrada/salida y reintentos de una respuesta de chat.completions."""
+    usage = getattr(response, "usage", None)
+    data["tokens_in"] = getattr(usage, "prompt_tokens", None)
+    data["tokens_out"] = getattr(usage, "completion_tokens", None)
+    data["retries"] = retries
+
+
+def bind(fn):
+    """fn ejecutándose en una copia del contexto actual (para pasar la traza a otro hilo)."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+# =============================================================================
+# ARCHIVO DE TRAZAS
+# =============================================================================
+
+def get_trace_path():
+    """VOBO_TRACE_FILE, o traces.jsonl junto a la caché. VOBO_TRACE=0 desactiva el archivo."""
+    from validator.cache import DEFAULT_CACHE_DIR  # cache importa este módulo
+
+    if os.getenv("VOBO_TRACE", "1") == "0":
+        return None
+    return os.getenv("VOBO_TRACE_FILE") or os.path.join(os.getenv("VOBO_CACHE_DIR", DEFAULT_CACHE_DIR), TRACE_NAME)
+
+
+def _trace_max_bytes() -> int:
+    return int(float(os.getenv("VOBO_TRACE_MAX_MB", DEFAULT_TRACE_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+
+
+def write_trace(metrics: dict, path: str = None, max_bytes: int = None) -> None:
+    """
+    Añade la traza como una línea JSON; un fallo de escritura no afecta a la validación.
+    Si la línea haría pasar el archivo de max_bytes (VOBO_TRACE_MAX_MB), el archivo actual
+    pasa a <archivo>.1 (reemplazando el anterior) y se empieza uno nuevo: en disco nunca
+    hay más de ~2 × max_bytes de trazas.
+    """
+    path = path or get_trace_path()
+    if not path: return
+    if max_bytes is None: max_bytes = _trace_max_bytes()
+    line = json.dumps({"ts": time.time(), **metrics}, ensure_ascii=False, default=str)
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) + len(line) + 1 > max_bytes:
+            os.replace(path, path + ".1")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        pass
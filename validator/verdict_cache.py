@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from llm import openai_client
+from validator.cache import DEFAULT_CACHE_DIR
+
+DB_NAME = "verdicts.sqlite3"
+# Al superar este número de veredictos se eliminan los menos usados (used_at)
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+# =============================================================================
+# CLAVES
+# =============================================================================
+
+def normalize(text) -> str:
+    """
+    Normalización de las partes de la clave (espacios/mayúsculas, 500 = "500"). Los validadores
+    la usan también para asociar las respuestas del LLM con lo enviado: lo que comparte clave
+    debe compartir respuesta.
+    """
+    return re.sub(r"\s+", " ", str(text).replace("\xa0", " ")).strip().lower()
+
+
+def verdict_key(*parts) -> str:
+    """Clave estable para un veredicto: partes normalizadas (espacios/mayúsculas) + hash."""
+    raw = "\x1f".join(normalize(p) for p in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# ALMACÉN SQLITE
+# =============================================================================
+
+class VerdictCache:
+    """
+    Veredictos del LLM por elemento (par atributo/descripción, código/alias/descripción).
+    Cada veredicto es la lista de hallazgos para ese elemento ([] = correcto).
+    Cada lectura actualiza used_at; al pasar de max_entries se eliminan los menos usados.
+    """
+
+    def __init__(self, db_path: str = os.path.join(DEFAULT_CACHE_DIR, DB_NAME),
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Los validadores pueden correr en hilos: una conexión compartida con lock propio
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict TEXT NOT NULL, used_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_used_at ON verdicts (used_at)")
+            self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite limita el número de parámetros por sentencia
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for key, verdict in self._conn.execute(
+                        f"SELECT key, verdict FROM verdicts WHERE key IN ({marks})", chunk):
+                    found[key] = json.loads(verdict)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE verdicts SET used_at = ? WHERE key = ?",
+                                       [(now, k) for k in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, verdicts: dict) -> None:
+        if not verdicts: return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, used_at) VALUES (?, ?, ?)",
+                [(k, json.dumps(v, ensure_ascii=False), now) for k, v in verdicts.items()]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        if count <= self.max_entries: return
+        self._conn.execute(
+            "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY used_at LIMIT ?)",
+            (count - self.max_entries,)
+        )
+
+
+_default_stores = {}
+_default_lock = threading.Lock()
+
+
+def _db_path(backend: str) -> str:
+    # Los veredictos de backends que no son OpenAI (fake, cassette) van a su propio archivo
+    # para no mezclarse nunca con los reales
+    path = os.getenv("VOBO_VERDICT_DB") or os.path.join(os.getenv("VOBO_CACHE_DIR", DEFAULT_CACHE_DIR), DB_NAME)
+    if backend == "openai":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-{backend}{ext}"
+
+
+def get_verdict_cache():
+    """Almacén por defecto del proceso (VOBO_VERDICT_DB, o junto a la caché de resultados). VOBO_CACHE=0 lo desactiva."""
+    if os.getenv("VOBO_CACHE", "1") == "0":
+        return None
+    backend = openai_client.get_backend().name
+    with _default_lock:
+        if backend not in _default_stores:
+            try:
+                _default_stores[backend] = VerdictCache(
+                    _db_path(backend), int(os.getenv("VOBO_VERDICT_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+            except (OSError, sqlite3.Error):
+                return None
+    return _default_stores[backend]
@@ -1,48 +1,222 @@
-import pandas as pd
-from validator.statuscode import validate_error_definitions
+import queue
+from contextlib import nullcontext
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm import openai_client
+from validator.statuscode import validate_error_definitions, validate_error_structure
 from validator.backend_mapping import validate_backend_mapping
 from validator.bian_validation import validate_bian_alignment
+from validator.workbook import as_source, load_workbook
+from validator.cache import get_result_cache, result_key, source_digest
+from validator import events, telemetry
+from validator.issue import as_issue
 
-def _dedupe_issues(issues: list[dict]) -> list[dict]:
+def _dedupe_issues(issues: list) -> list:
+    # Cada Issue trae su clave (hoja, atributo, categoría, nivel, mensaje) ya calculada;
+    # los dicts (p.ej. leídos de la caché por hoja) se convierten al vuelo
     seen = set()
     unique = []
-    for i in issues:
-        key = (
-            str(i.get("sheet", "")).strip(),
-            str(i.get("attribute", "")).strip(),
-            str(i.get("category", "")).strip(),
-            str(i.get("level", "")).strip(),
-            str(i.get("message", "")).strip(),
-        )
-        if key in seen: continue
-        seen.add(key)
+    for i in map(as_issue, issues):
+        if i.key in seen: continue
+        seen.add(i.key)
         unique.append(i)
     return unique
 
 
-def run_vobo(excel_path: str) -> dict:
+def _llm_mode() -> str:
+    return openai_client.llm_mode()
+
+
+def run_vobo(excel_path: str, streaming: bool = False, use_cache: bool = True, concurrent: bool = False,
+             metrics: bool = False, fast: bool = False) -> dict:
+    """
+    Ejecuta el VoBo completo. Con use_cache el resultado se guarda en disco por hash del
+    contenido del libro + versión de reglas: re-validar el mismo archivo no re-parsea ni re-llama al LLM.
+    Con concurrent=True los tres validadores corren en hilos (la latencia pasa a ser la del más lento);
+    el resultado es idéntico al modo secuencial.
+    Con metrics=True el resultado incluye "metrics": tiempos por validador, hoja, parseo y llamada
+    al LLM (con tokens y reintentos). La traza también se añade a traces.jsonl (ver telemetry).
+    excel_path acepta también los bytes del libro o un buffer: se leen una vez y no se escriben a disco.
+    Con fast=True (veredicto rápido) primero corren los checks deterministas; si ya bastan para
+    rechazar, los checks con LLM no se ejecutan (o se cortan en cuanto el rechazo es seguro) y
+    result["skipped"] dice cuáles quedaron fuera. El veredicto es el mismo que en modo completo.
+    """
+    excel_path = as_source(excel_path)
+    if not metrics:
+        return _run_vobo(excel_path, streaming, use_cache, concurrent, fast)
+
+    with telemetry.tracing(streaming=streaming, concurrent=concurrent, fast=fast) as trace:
+        result = _run_vobo(excel_path, streaming, use_cache, concurrent, fast)
+    # Copia superficial: las métricas nunca forman parte del resultado cacheado
+    result = {**result, "metrics": trace.metrics()}
+    telemetry.write_trace(result["metrics"])
+    return result
+
+
+def iter_vobo(excel_path, streaming: bool = False, use_cache: bool = True, concurrent: bool = True,
+              metrics: bool = False, fast: bool = False):
+    """
+    Variante generadora de run_vobo: produce los hallazgos a medida que cada hoja y cada
+    validador terminan, sin esperar a los checks semánticos del LLM. Eventos (dicts con "type"):
+      - "partial": stage, sheet, issues — hallazgos adelantados de una hoja (p.ej. los estructurales
+        de códigos de estado, antes de la consulta al LLM); vuelven a llegar en su evento "sheet".
+      - "sheet": stage, sheet, issues, complete, cache — hallazgos de una hoja (sin deduplicar:
+        Issue.key sirve para descartar los ya vistos).
+      - "validator": validator, issues (cantidad), incomplete — terminó un validador.
+      - "result": result — el mismo dict que devolvería run_vobo (veredicto y Strike 3 incluidos).
+    Con un acierto de la caché de resultados solo llega "result". run_vobo corre en un hilo
+    aparte; si falla, la excepción se relanza aquí.
+    """
+    pending = queue.Queue()
+    done = object()
+
+    def work():
+        try:
+            with events.collecting(pending.put):
+                result = run_vobo(excel_path, streaming=streaming, use_cache=use_cache,
+                                  concurrent=concurrent, metrics=metrics, fast=fast)
+            pending.put({"type": "result", "result": result})
+        except BaseException as e:
+            pending.put(e)
+        finally:
+            pending.put(done)
+
+    threading.Thread(target=work, name="iter_vobo", daemon=True).start()
+    while True:
+        event = pending.get()
+        if event is done:
+            return
+        if isinstance(event, BaseException):
+            raise event
+        if event["type"] in ("sheet", "partial"):
+            # Los aciertos de la caché por hoja llegan como dicts
+            event["issues"] = [as_issue(i) for i in event["issues"]]
+        yield event
+
+
+def _run_vobo(excel_path, streaming: bool, use_cache: bool, concurrent: bool, fast: bool = False) -> dict:
+    with telemetry.span("run", "run_vobo") as sp:
+        return _run_vobo_cached(excel_path, streaming, use_cache, concurrent, fast, sp)
+
+
+def _run_vobo_cached(excel_path, streaming: bool, use_cache: bool, concurrent: bool, fast: bool, sp: dict) -> dict:
+    cache = get_result_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        try:
+            # El modo rápido puede omitir hallazgos: se cachea aparte
+            key = result_key(source_digest(excel_path), f"llm={_llm_mode()}", *(["fast"] if fast else []))
+        except (OSError, TypeError):
+            key = None
+
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            sp["cache"] = "hit"
+            cached["details"] = [as_issue(i) for i in cached.get("details", [])]
+            return cached
+    sp["cache"] = "miss" if key else "off"
+
+    # Sin acierto global, la misma caché guarda los hallazgos por hoja: en una revisión
+    # nueva de la matriz solo se re-validan las hojas que cambiaron.
+    result = _run_vobo_uncached(excel_path, streaming, cache, concurrent, fast)
+
+    if key and not result.get("incomplete"):
+        cache.put(key, result)
+    return result
+
+
+VALIDATORS = (validate_error_definitions, validate_backend_mapping, validate_bian_alignment)
+# Veredicto rápido: primero lo determinista; los checks con LLM solo si el VoBo aún puede aprobarse
+CHEAP_VALIDATORS = (validate_error_structure, validate_backend_mapping)
+LLM_VALIDATORS = (validate_error_definitions, validate_bian_alignment)
+LLM_CHECKS = ("statuscode_coherence", "bian_semantic")
+
+# Más hallazgos que esto (aunque ninguno bloquee) rechaza el VoBo (Strike 3)
+STRIKE_LIMIT = 3
+
+
+def _run_validator(validator, wb, sheet_cache) -> dict:
+    with telemetry.span("validator", validator.__name__):
+        result = validator(wb, sheet_cache=sheet_cache)
+    events.emit("validator", validator=validator.__name__, issues=len(result.get("details", [])),
+                incomplete=bool(result.get("incomplete")))
+    return result
+
+
+def _run_validators(validators, wb, sheet_cache, concurrent: bool) -> list:
+    if not concurrent:
+        return [_run_validator(v, wb, sheet_cache) for v in validators]
+    # Los dos validadores con LLM pasan casi todo el tiempo esperando la red: basta con hilos.
+    # Se recogen en el orden recibido para que el dedupe dé lo mismo que en secuencial.
+    with ThreadPoolExecutor(max_workers=len(validators)) as pool:
+        futures = [pool.submit(telemetry.bind(_run_validator), v, wb, sheet_cache) for v in validators]
+        return [f.result() for f in futures]
+
+
+def _rejection_certain(issues: list) -> bool:
+    """Ningún hallazgo adicional puede salvar el VoBo: ya hay un bloqueante o se pasó el Strike 3."""
+    return len(issues) > STRIKE_LIMIT or any(as_issue(i).blocking for i in issues)
+
+
+def _run_fast(wb, sheet_cache, concurrent: bool) -> tuple[list, list]:
+    """Veredicto rápido. Devuelve (resultados en el orden de VALIDATORS, checks omitidos)."""
+    cheap = _run_validators(CHEAP_VALIDATORS, wb, sheet_cache, concurrent)
+    found = _dedupe_issues([i for r in cheap for i in r.get("details", [])])
+    if _rejection_certain(found):
+        return [cheap[0], cheap[1], {"details": []}], list(LLM_CHECKS) if _llm_mode() != "off" else []
+
+    # Aún puede aprobarse: corren los checks con LLM, vigilando los hallazgos que van llegando
+    # para abandonar los lotes pendientes en cuanto el rechazo sea seguro
+    stop = threading.Event()
+    seen = {i.key for i in found}
+    lock = threading.Lock()
+
+    def watch(event):
+        if event["type"] not in ("sheet", "partial"): return
+        with lock:
+            for i in map(as_issue, event["issues"]):
+                seen.add(i.key)
+                if i.blocking: stop.set()
+            if len(seen) > STRIKE_LIMIT: stop.set()
+
+    with events.collecting(watch), events.cancel_scope(stop):
+        llm = _run_validators(LLM_VALIDATORS, wb, sheet_cache, concurrent)
+
+    skipped = [name for name, r in zip(LLM_CHECKS, llm) if stop.is_set() and r.get("incomplete")]
+    return [llm[0], cheap[1], llm[1]], skipped
+
+
+def _run_vobo_uncached(excel_path, streaming: bool, sheet_cache=None, concurrent: bool = False,
+                       fast: bool = False) -> dict:
     issues: list[dict] = []
+    skipped = []
 
-    # 1. Ejecutar validadores
-    issues.extend(validate_error_definitions(excel_path).get("details", []))
-    issues.extend(validate_backend_mapping(excel_path).get("details", []))
-    issues.extend(validate_bian_alignment(excel_path).get("details", []))
+    # 1. Ejecutar validadores (el libro se parsea una sola vez y se comparte)
+    #    streaming=True: las hojas de backend se leen fila a fila sin materializarse
+    #    Un Workbook recibido del llamador no se cierra: sigue siendo suyo
+    wb = load_workbook(excel_path, streaming=streaming)
+    with (nullcontext(wb) if wb is excel_path else wb):
+        if fast:
+            results, skipped = _run_fast(wb, sheet_cache, concurrent)
+        else:
+            results = _run_validators(VALIDATORS, wb, sheet_cache, concurrent)
+    for r in results:
+        issues.extend(r.get("details", []))
+    incomplete = any(r.get("incomplete") for r in results)
 
     # 2. Deduplicar
     issues = _dedupe_issues(issues)
 
     # 3. Política VoBo
     # Regla base: Bloquea si es ERROR explícito
-    blocking_issues = []
-    for e in issues:
-        if e.get("blocks_vobo") is True or e.get("level") == "ERROR":
-            blocking_issues.append(e)
+    blocking_issues = [e for e in issues if e.blocking]
 
     vobo_ok = len(blocking_issues) == 0
 
     # CAMBIO 3: Regla de límite de tolerancia (Strike 3)
     # Si ya estaba aprobado por errores críticos, revisamos si tiene demasiados warnings
-    if vobo_ok and len(issues) > 3:
+    if vobo_ok and len(issues) > STRIKE_LIMIT:
         vobo_ok = False
         main_message = (
             "❌ **VoBo Rechazado (Exceso de hallazgos)**\n"
@@ -57,8 +231,14 @@ def run_vobo(excel_path: str) -> dict:
     else:
         main_message = "❌ **VoBo Rechazado**\nSe encontraron errores bloqueantes en la estructura o contrato."
 
-    return {
+    result = {
         "vobo": vobo_ok,
         "message": main_message,
         "details": issues,
-    }
\ No newline at end of file
+    }
+    if skipped:
+        result["skipped"] = skipped
+    # Algún check semántico falló (p.ej. timeout del LLM) o se cortó a mitad: el resultado no se cachea
+    if incomplete:
+        result["incomplete"] = True
+    return result
\ No newline at end of file
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import math
+import threading
+
+import pandas as pd
+
+from validator.grid import SheetGrid
+from validator import telemetry
+
+# Mismos marcadores que read_excel interpreta como celda vacía (na_values por defecto)
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+}
+
+
+# =============================================================================
+# SNAPSHOT DEL LIBRO
+# =============================================================================
+
+class Workbook:
+    """
+    Snapshot en memoria de una matriz de transformación.
+    El archivo se abre una sola vez y cada hoja se parsea (XML -> DataFrame) como máximo una vez,
+    de modo que todos los validadores de una misma corrida comparten el mismo resultado.
+
+    Con streaming=True, iter_rows() lee las filas de forma perezosa (openpyxl read_only) sin
+    materializar ni guardar la hoja: los bucles que cortan antes (SQL, "insert into") no pagan
+    el resto de la hoja y la memoria queda acotada en hojas muy altas.
+
+    excel_path puede ser una ruta, los bytes del libro o un buffer (p.ej. un archivo subido):
+    sin pasar por disco, el libro se lee del buffer una sola vez y queda una única copia en memoria.
+    """
+
+    def __init__(self, excel_path, streaming: bool = False):
+        self.source = as_source(excel_path)
+        self.streaming = streaming
+        data = io.BytesIO(self.source) if isinstance(self.source, bytes) else self.source
+        with telemetry.span("parse", "open_workbook", streaming=streaming):
+            self._xls = pd.ExcelFile(data, engine="openpyxl")
+        self.sheet_names = list(self._xls.sheet_names)
+        self._frames = {}
+        self._fingerprints = {}
+        self._grids = {}
+        # Los validadores pueden correr en hilos en paralelo sobre el mismo snapshot
+        self._lock = threading.RLock()
+
+    def sheet(self, name) -> pd.DataFrame:
+        """Devuelve la hoja como DataFrame sin cabecera (equivale a read_excel(..., header=None))."""
+        with self._lock:
+            if name not in self._frames:
+                with telemetry.span("parse", "parse_sheet", sheet=name) as sp:
+                    try:
+                        self._frames[name] = self._xls.parse(name, header=None)
+                        sp["rows"], sp["cols"] = self._frames[name].shape
+                    except Exception as e:
+                        # Recordamos el fallo para no volver a parsear una hoja corrupta
+                        self._frames[name] = e
+            frame = self._frames[name]
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def iter_rows(self, name):
+        """
+        Itera las filas de la hoja como tuplas de valores (NaN en celdas vacías).
+        Si la hoja ya está en memoria se recorre el DataFrame; en modo streaming se leen del XML bajo demanda.
+        """
+        if name in self._frames or not self.streaming:
+            yield from self.sheet(name).itertuples(index=False, name=None)
+            return
+
+        ws = self._xls.book[name]
+        width = ws.max_column
+        if not width:
+            # Sin dimensión declarada no podemos rellenar filas: caemos al DataFrame
+            yield from self.sheet(name).itertuples(index=False, name=None)
+            return
+
+        for row in ws.iter_rows(max_col=width, values_only=True):
+            yield tuple(_convert_value(v) for v in row)
+
+    def grid(self, name) -> SheetGrid:
+        """Rejilla normalizada de la hoja, compartida por todos los detectores de cabecera."""
+        with self._lock:
+            if name not in self._grids:
+                df = self.sheet(name)
+                with telemetry.span("parse", "build_grid", sheet=name):
+                    self._grids[name] = SheetGrid(df)
+            return self._grids[name]
+
+    def fingerprint(self, name) -> str:
+        """Hash del contenido de la hoja (valores celda a celda); cambia solo si la hoja cambia."""
+        with self._lock:
+            if name not in self._fingerprints:
+                with telemetry.span("parse", "fingerprint", sheet=name):
+                    h = hashlib.sha256()
+                    for row in self.iter_rows(name):
+                        h.update("\x1f".join(str(v) for v in row).encode("utf-8"))
+                        h.update(b"\x1e")
+                    self._fingerprints[name] = h.hexdigest()
+            return self._fingerprints[name]
+
+    def close(self):
+        self._xls.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _convert_value(val):
+    """Replica la conversión de read_excel: vacíos/marcadores NA -> NaN y flotantes enteros -> int."""
+    if val is None:
+        return math.nan
+    if isinstance(val, str):
+        return math.nan if val in NA_STRINGS else val
+    if isinstance(val, float) and val.is_integer():
+        return int(val)
+    return val
+
+
+def as_source(excel_path):
+    """
+    Ruta (str/PathLike) o Workbook tal cual; bytes-like y buffers (read()) pasan a bytes.
+    Un buffer se lee entero desde el principio una sola vez y no se cierra.
+    """
+    if isinstance(excel_path, bytes):
+        return excel_path
+    if isinstance(excel_path, (bytearray, memoryview)):
+        return bytes(excel_path)
+    if hasattr(excel_path, "getvalue"):
+        # BytesIO y UploadedFile de Streamlit: sin mover el cursor del llamador
+        return excel_path.getvalue()
+    if hasattr(excel_path, "read"):
+        if hasattr(excel_path, "seek"): excel_path.seek(0)
+        return excel_path.read()
+    return excel_path
+
+
+def load_workbook(excel_path, streaming: bool = False) -> Workbook:
+    """Acepta una ruta, bytes/buffer o un Workbook ya cargado (compatibilidad con las firmas basadas en ruta)."""
+    if isinstance(excel_path, Workbook):
+        return excel_path
+    return Workbook(excel_path, streaming=streaming)